@@ -1,6 +1,6 @@
 'use client';
 
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import Link from 'next/link';
 import { useAuth } from '@/hooks/use-auth';
 import { useModal } from '@/hooks/use-modal-store';
@@ -25,6 +25,7 @@ interface GroceryList {
   id: string;
   name: string;
   ownerId: string;
+  items?: GroceryItem[];
 }
 const LoadingState = () => (
   <div className="flex justify-center items-center p-12 mt-10">
@@ -49,6 +50,8 @@ export default function GroceriesDashboardPage() {
   const [activeListId, setActiveListId] = useState<string | null>(null);
 
   const [items, setItems] = useState<GroceryItem[]>([]);
+  // Items per list from /api/dashboard, so switching lists doesn't hit the server
+  const itemsByList = useRef<Record<string, GroceryItem[]>>({});
   const [newItemName, setNewItemName] = useState('');
 
   const [isLoading, setIsLoading] = useState(true);
@@ -66,18 +69,21 @@ export default function GroceriesDashboardPage() {
       setIsLoading(true);
       setError(null);
       try {
-        const res = await fetch(`${API_URL}/api/lists?userId=${user.uid}`);
+        const res = await fetch(`${API_URL}/api/dashboard?userId=${user.uid}`);
         if (!res.ok) {
           throw new Error('Failed to fetch your lists.');
         }
         const data: GroceryList[] = await res.json();
+        itemsByList.current = {};
+        data.forEach((list) => {
+          if (list.items) itemsByList.current[list.id] = list.items;
+        });
         setLists(data);
 
         if (data.length > 0) {
-          const currentListExists = data.some((list) => list.id === activeListId);
-          if (!activeListId || !currentListExists) {
-            setActiveListId(data[0].id);
-          }
+          setActiveListId((current) =>
+            current && data.some((list) => list.id === current) ? current : data[0].id
+          );
         } else {
           setActiveListId(null);
           setItems([]);
@@ -89,7 +95,7 @@ export default function GroceriesDashboardPage() {
       }
     };
     fetchLists();
-  }, [user, API_URL, refetchId, activeListId]);
+  }, [user, API_URL, refetchId]);
 
   useEffect(() => {
     if (isLoading || !activeListId) {
@@ -97,6 +103,12 @@ export default function GroceriesDashboardPage() {
       return;
     }
 
+    const cachedItems = itemsByList.current[activeListId];
+    if (cachedItems) {
+      setItems(cachedItems);
+      return;
+    }
+
     const fetchItems = async () => {
       setIsItemsLoading(true);
       try {
@@ -105,6 +117,7 @@ export default function GroceriesDashboardPage() {
           throw new Error('Failed to fetch items for this list.');
         }
         const data: GroceryItem[] = await res.json();
+        itemsByList.current[activeListId] = data;
         setItems(data);
       } catch (err: any) {
         setError(err.message);
@@ -117,8 +130,17 @@ export default function GroceriesDashboardPage() {
 
   // --- Event Handlers ---
 
+  // Keeps the per-list cache in step with local edits to the active list
+  const updateItems = (update: (currentItems: GroceryItem[]) => GroceryItem[]) => {
+    setItems((currentItems) => {
+      const nextItems = update(currentItems);
+      if (activeListId) itemsByList.current[activeListId] = nextItems;
+      return nextItems;
+    });
+  };
+
   const handleToggleItem = async (itemId: string, currentStatus: boolean) => {
-    setItems((currentItems) =>
+    updateItems((currentItems) =>
       currentItems.map((item) =>
         item.id === itemId ? { ...item, purchased: !currentStatus } : item
       )
@@ -153,7 +175,7 @@ export default function GroceriesDashboardPage() {
       if (!res.ok) throw new Error('Failed to add item.');
       const addedItem: GroceryItem = await res.json();
       setNewItemName('');
-      setItems((currentItems) => [addedItem, ...currentItems]);
+      updateItems((currentItems) => [addedItem, ...currentItems]);
 
     } catch (err: any) {
       setError(err.message || 'Failed to add item. Please try again.');
@@ -161,7 +183,7 @@ export default function GroceriesDashboardPage() {
   };
 
   const handleDeleteItem = async (itemId: string) => {
-    setItems((currentItems) =>
+    updateItems((currentItems) =>
       currentItems.filter((item) => item.id !== itemId)
     );
     try {
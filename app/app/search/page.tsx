@@ -1,13 +1,13 @@
 "use client"
 
-import { useState } from "react"
+import { useEffect, useState } from "react"
 import { ShoppingCart, Search, MapPin, TrendingUp, ArrowLeft, Loader2, AlertTriangle } from "lucide-react"
 
 // ============================================
 // TYPES
 // ============================================
 
-// This interface now maps to the *frontend* display card
+// Matches the records returned by /api/prices/search
 interface StoreResult {
   storeName: string
   productName: string
@@ -17,14 +17,11 @@ interface StoreResult {
   inStock: boolean
 }
 
-// This interface maps to the *backend* API response
-interface ApiResponseItem {
-  Store: string
-  "Product Name": string
-  "Product URL": string
-  Country: string
-  "Price over time": { Date: string, Price: number }[]
-  // ... other fields
+// Matches the suggestions returned by /api/prices/suggest
+interface Suggestion {
+  text: string
+  type: "query" | "product"
+  hits: number
 }
 
 // ============================================
@@ -33,10 +30,43 @@ interface ApiResponseItem {
 
 function SearchBar({ onSearch, isLoading }: { onSearch: (query: string) => void; isLoading: boolean }) {
   const [query, setQuery] = useState("")
+  const [suggestions, setSuggestions] = useState<Suggestion[]>([])
+  const [showSuggestions, setShowSuggestions] = useState(false)
+
+  const API_URL = process.env.NEXT_PUBLIC_API_BASE_URL;
+
+  useEffect(() => {
+    const prefix = query.trim()
+    if (!prefix) {
+      setSuggestions([])
+      return
+    }
+
+    // Debounced, and stale responses are dropped when the user keeps typing
+    const controller = new AbortController()
+    const timer = setTimeout(async () => {
+      try {
+        const response = await fetch(`${API_URL}/api/prices/suggest?q=${encodeURIComponent(prefix)}`, { signal: controller.signal })
+        if (response.ok) setSuggestions(await response.json())
+      } catch {
+        // Typeahead is best effort; the full search still works without it
+      }
+    }, 120)
+
+    return () => {
+      clearTimeout(timer)
+      controller.abort()
+    }
+  }, [query, API_URL])
+
+  const submit = (value: string) => {
+    setShowSuggestions(false)
+    if (value.trim()) onSearch(value.trim())
+  }
 
   const handleSubmit = (e: React.FormEvent) => {
     e.preventDefault()
-    if (query.trim()) onSearch(query.trim())
+    submit(query)
   }
 
   return (
@@ -46,12 +76,38 @@ function SearchBar({ onSearch, isLoading }: { onSearch: (query: string) => void;
         <input
           type="text"
           value={query}
-          onChange={(e) => setQuery(e.target.value)}
+          onChange={(e) => {
+            setQuery(e.target.value)
+            setShowSuggestions(true)
+          }}
+          onFocus={() => setShowSuggestions(true)}
+          onBlur={() => setShowSuggestions(false)}
           placeholder="Enter an ingredient (e.g., organic eggs, avocados)..."
           disabled={isLoading}
           className="h-16 w-full rounded-2xl border border-border/50 bg-card pl-16 pr-6 text-base font-medium text-foreground shadow-sm transition-all placeholder:text-muted-foreground focus:border-primary/50 focus:outline-none focus:ring-4 focus:ring-primary/10 disabled:opacity-50"
         />
       </div>
+      {showSuggestions && suggestions.length > 0 && (
+        <ul className="absolute z-10 mt-2 w-full overflow-hidden rounded-2xl border border-border/50 bg-card shadow-lg">
+          {suggestions.map((suggestion) => (
+            <li key={`${suggestion.type}-${suggestion.text}`}>
+              <button
+                type="button"
+                // onMouseDown fires before the input's blur hides the list
+                onMouseDown={(e) => {
+                  e.preventDefault()
+                  setQuery(suggestion.text)
+                  submit(suggestion.text)
+                }}
+                className="flex w-full items-center justify-between px-6 py-3 text-left text-sm text-foreground hover:bg-primary/10"
+              >
+                <span>{suggestion.text}</span>
+                {suggestion.type === "query" && <TrendingUp className="h-4 w-4 text-muted-foreground" />}
+              </button>
+            </li>
+          ))}
+        </ul>
+      )}
     </form>
   )
 }
@@ -180,54 +236,12 @@ export default function SearchPage() {
     setError(null)
 
     try {
-      // --- STEP 1: Get janky, unsorted results from the price API ---
-      const priceResponse = await fetch(`${API_URL}/api/prices?grocery=${query}`)
-      if (!priceResponse.ok) throw new Error("Failed to fetch prices from the server.")
-
-      const data = await priceResponse.json()
-
-      const resultsArray: StoreResult[] = Object.entries(data.results).flatMap(([storeName, items]: any) => {
-        const storeItems: ApiResponseItem[] = Array.isArray(items) ? items : [items]
-
-        return storeItems.flatMap((item: ApiResponseItem) => {
-          const priceHistory = item["Price over time"];
-          if (!priceHistory || priceHistory.length === 0) return [];
-
-          const latestPriceInfo = priceHistory[priceHistory.length - 1];
-          const priceNum = parseFloat(String(latestPriceInfo.Price));
-
-          if (isNaN(priceNum) || priceNum <= 0) return [];
-
-          return [{
-            storeName: item.Store || storeName,
-            productName: item["Product Name"],
-            productUrl: item["Product URL"],
-            location: item.Country || "Location N/A",
-            price: priceNum,
-            inStock: true,
-          }];
-        });
-      });
-
-      // --- STEP 2: Send the janky results to our AI to be ranked ---
-      if (resultsArray.length > 0) {
-        const rankResponse = await fetch(`${API_URL}/api/prices/rank`, {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ query: query, results: resultsArray })
-        });
-
-        if (!rankResponse.ok) {
-          // If ranking fails, just show price-sorted results
-          setResults(resultsArray.sort((a, b) => a.price - b.price));
-        } else {
-          // Set results to the new, AI-sorted list!
-          const sortedResults = await rankResponse.json();
-          setResults(sortedResults);
-        }
-      } else {
-        setResults([]); // No results found
-      }
+      // Fetching, flattening and AI ranking all happen server-side in one call
+      const response = await fetch(`${API_URL}/api/prices/search?grocery=${encodeURIComponent(query)}`)
+      if (!response.ok) throw new Error("Failed to fetch prices from the server.")
+
+      const rankedResults: StoreResult[] = await response.json()
+      setResults(rankedResults)
 
     } catch (err: any) {
       console.error(err)
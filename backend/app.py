@@ -1,21 +1,166 @@
-from firebase_admin import firestore
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
-import ast
+import itertools
+import json
 from google.api_core import exceptions
-from datetime import datetime # Import datetime to handle the conversion
-
-from scraper.scrapers import get_food_prices
-from firebase_setup import db
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import config
+from firebase_setup import db, firestore, get_db
+from doc_cache import doc_cache, recipe_key, user_key, user_lists_key, list_items_key
+from price_cache import price_cache
+import price_history
+import price_prewarm
+import basket
+from product_index import product_index, start_snapshots
+import list_cleanup
+import gemini_client
+import metrics
+import serialization
+from serialization import document_dict, stream_json_array
 import recipe_functions
+import recipe_pool
+import recipe_index
+import ranker
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['X-Next-Cursor', 'X-Rank-Path'])
+metrics.init_app(app)
+serialization.init_app(app)
+price_prewarm.start()
+start_snapshots()
+
+# Building the Firestore and Gemini clients is deferred to first use. Set to
+# 'background' (or 'blocking') to build them at startup instead, e.g. on
+# platforms that send traffic as soon as the process is up.
+STARTUP_WARMUP = config.get('STARTUP_WARMUP', 'off')
+
+
+def warm_up():
+    """ Builds the lazily-created upstream clients now. Returns ms per client, None if it failed. """
+    timings = {}
+    for name, build in (('firestore', get_db), ('gemini', gemini_client.get_model)):
+        start = time.perf_counter()
+        try:
+            build()
+            timings[name] = round((time.perf_counter() - start) * 1000, 1)
+        except Exception as e:
+            print(f"Warm-up of {name} failed: {repr(e)}")
+            timings[name] = None
+    return timings
+
+
+if STARTUP_WARMUP == 'blocking':
+    warm_up()
+elif STARTUP_WARMUP == 'background':
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
 
 @app.route('/')
 def home():
     return 'Page for backend testing'
 
+@app.route('/_ah/warmup')
+def warmup_route():
+    """ Warm-up hook (App Engine calls this path before routing traffic to an instance). """
+    timings = warm_up()
+    return jsonify(timings), 200 if all(v is not None for v in timings.values()) else 503
+
+@app.route('/metrics')
+def get_metrics():
+    """ Prometheus text exposition of route and upstream latency histograms. """
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Firestore caps a WriteBatch at 500 writes
+MAX_BATCH_WRITES = 500
+# How many of a user's lists /api/dashboard embeds items for
+DASHBOARD_LIST_LIMIT = int(config.get('DASHBOARD_LIST_LIMIT', '20'))
+# Item subcollections read in parallel per dashboard request
+_dashboard_executor = ThreadPoolExecutor(max_workers=int(config.get('DASHBOARD_MAX_WORKERS', '8')))
+
+def _created_document(data, doc_id, update_time):
+    """
+    Builds a create route's response without reading the document back.
+    SERVER_TIMESTAMP resolves to the write's commit time, which the write result carries.
+    """
+    new_doc = dict(data)
+    new_doc['id'] = doc_id
+    if new_doc.get('createdAt') is firestore.SERVER_TIMESTAMP:
+        new_doc['createdAt'] = update_time
+    return new_doc
+
+def _apply_page_args(query, collection_ref):
+    """
+    Applies the optional ?fields=a,b projection, ?start_after=<doc id> cursor
+    and ?limit=N to a query. Returns (query, limit); limit is None when the
+    caller wants everything.
+    """
+    fields = request.args.get('fields')
+    if fields:
+        query = query.select([f.strip() for f in fields.split(',') if f.strip()])
+
+    cursor = request.args.get('start_after')
+    if cursor:
+        cursor_doc = collection_ref.document(cursor).get()
+        if not cursor_doc.exists:
+            raise ValueError("Invalid 'start_after' cursor")
+        query = query.start_after(cursor_doc)
+
+    limit = request.args.get('limit')
+    if limit is None:
+        return query, None
+    if not limit.isdigit() or int(limit) == 0:
+        raise ValueError("'limit' must be a positive integer")
+
+    # One extra document tells us whether there is a next page
+    return query.limit(int(limit) + 1), int(limit)
+
+def _has_page_args():
+    return any(arg in request.args for arg in ('limit', 'start_after', 'fields', 'stream'))
+
+def _serialize_docs(docs):
+    # Timestamps are left as datetimes; the JSON provider encodes them
+    return [document_dict(doc) for doc in docs]
+
+def _conditional_json(data, headers=None):
+    """
+    jsonify with an ETag of the body; answers 304 Not Modified when the
+    client's If-None-Match already matches.
+    """
+    response = jsonify(data)
+    if headers:
+        response.headers.update(headers)
+    response.add_etag()
+    return response.make_conditional(request)
+
+def _wants_stream():
+    return request.args.get('stream', 'false').lower() == 'true'
+
+def _stream_response(docs):
+    """
+    Writes documents out as Firestore yields them, for ?stream=true reads of
+    a whole collection. There's no ETag, since the body isn't known upfront.
+    """
+    # Pull the first document here so query errors (e.g. a missing index)
+    # still reach the route's handlers instead of breaking the stream
+    docs = iter(docs)
+    first = next(docs, None)
+    docs = itertools.chain([first], docs) if first is not None else iter(())
+    return Response(stream_with_context(stream_json_array(docs, document_dict)), mimetype='application/json')
+
+def _page_response(docs, limit):
+    """ Serializes a page of documents; X-Next-Cursor is set when more remain. """
+    if limit is None and _wants_stream():
+        return _stream_response(docs)
+    results = _serialize_docs(docs)
+
+    headers = {}
+    if limit is not None and len(results) > limit:
+        results = results[:limit]
+        headers['X-Next-Cursor'] = results[-1]['id']
+    return _conditional_json(results, headers)
+
 #########################################################
 # CRUD for Users
 #########################################################
@@ -38,6 +183,7 @@ def create_user():
         }
         
         doc_ref.set(new_user_data)
+        doc_cache.invalidate(user_key(uid))
         return jsonify({"id": uid}), 201
         
     except Exception as e:
@@ -45,17 +191,19 @@ def create_user():
 
 @app.route('/api/users/<user_id>', methods=['GET'])
 def get_user(user_id):
-    try:
+    def load():
         doc = db.collection('users').document(user_id).get()
         if not doc.exists:
+            return None
+
+        return doc.to_dict()
+
+    try:
+        user_data = doc_cache.get_or_load(user_key(user_id), load)
+        if user_data is None:
             return jsonify({'error': 'User not found'}), 404
             
-        user_data = doc.to_dict()
-        
-        if 'createdAt' in user_data and isinstance(user_data['createdAt'], datetime):
-            user_data['createdAt'] = user_data['createdAt'].isoformat()
-            
-        return jsonify(user_data)
+        return _conditional_json(user_data)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -64,10 +212,12 @@ def update_user(user_id):
     try:
         data = request.get_json()
         doc_ref = db.collection("users").document(user_id)
-        if not doc_ref.get().exists:
-            return jsonify({"error": "User not found"}), 404
+        # update() only succeeds on an existing document, so no separate existence read
         doc_ref.update(data)
+        doc_cache.invalidate(user_key(user_id))
         return jsonify({"message": "User updated"}), 200
+    except exceptions.NotFound:
+        return jsonify({"error": "User not found"}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -81,11 +231,9 @@ def create_list():
         data = request.get_json()
         data['createdAt'] = firestore.SERVER_TIMESTAMP
         
-        doc_ref = db.collection("lists").add(data)
-        new_list = doc_ref[1].get().to_dict()
-        new_list['id'] = doc_ref[1].id
-        if 'createdAt' in new_list and isinstance(new_list['createdAt'], datetime):
-            new_list['createdAt'] = new_list['createdAt'].isoformat()
+        update_time, doc_ref = db.collection("lists").add(data)
+        new_list = _created_document(data, doc_ref.id, update_time)
+        doc_cache.invalidate(user_lists_key(data.get('ownerId')))
             
         return jsonify(new_list), 201
     except Exception as e:
@@ -98,37 +246,94 @@ def get_user_lists():
         if not user_id:
             return jsonify({"error": "Missing 'userId' query parameter"}), 400
 
-        lists = []
-        
+        if not _has_page_args():
+            return _conditional_json(_read_user_lists(user_id))
+
+        lists_ref = db.collection('lists')
+        query = lists_ref \
+                 .where('ownerId', '==', user_id) \
+                 .order_by("createdAt", direction=firestore.Query.DESCENDING)
+        query, limit = _apply_page_args(query, lists_ref)
+        return _page_response(query.stream(), limit)
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except exceptions.FailedPrecondition as e:
+        print(f"!!! MISSING INDEX: {e.message}")
+        return jsonify({"error": "Database index error. Check backend console."}), 500
+    except Exception as e:
+        print(f"An error occurred in get_user_lists: {repr(e)}")
+        return jsonify({"error": str(e)}), 500
+
+def _read_user_lists(user_id):
+    def load():
         docs = db.collection('lists') \
                  .where('ownerId', '==', user_id) \
                  .order_by("createdAt", direction=firestore.Query.DESCENDING) \
                  .stream()
+        return _serialize_docs(docs)
 
-        for doc in docs:
-            list_data = doc.to_dict()
-            list_data['id'] = doc.id
-            if 'createdAt' in list_data and isinstance(list_data['createdAt'], datetime):
-                list_data['createdAt'] = list_data['createdAt'].isoformat()
-            
-            lists.append(list_data)
-        return jsonify(lists), 200
-    
+    return doc_cache.get_or_load(user_lists_key(user_id), load)
+
+@app.route('/api/dashboard', methods=['GET'])
+def get_dashboard():
+    """
+    A user's lists with their items embedded, in one round trip.
+    EXPECTS: ?userId=abc[&limit=20]
+    Only the first `limit` lists get an 'items' array; the item subcollections
+    are read concurrently.
+    """
+    try:
+        user_id = request.args.get('userId')
+        if not user_id:
+            return jsonify({"error": "Missing 'userId' query parameter"}), 400
+        limit = int(request.args.get('limit', DASHBOARD_LIST_LIMIT))
+
+        # Copies, so embedding items doesn't touch the cached lists
+        lists = [dict(list_data) for list_data in _read_user_lists(user_id)]
+
+        embedded = lists[:max(limit, 0)]
+        for list_data, items in zip(embedded, _dashboard_executor.map(metrics.in_request_context(_read_list_items), [l['id'] for l in embedded])):
+            list_data['items'] = items
+
+        return _conditional_json(lists)
+
+    except ValueError:
+        return jsonify({"error": "'limit' must be an integer"}), 400
     except exceptions.FailedPrecondition as e:
         print(f"!!! MISSING INDEX: {e.message}")
         return jsonify({"error": "Database index error. Check backend console."}), 500
     except Exception as e:
-        print(f"An error occurred in get_user_lists: {repr(e)}")
+        print(f"An error occurred in get_dashboard: {repr(e)}")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/lists/<list_id>', methods=['DELETE'])
 def delete_list(list_id):
+    """
+    Deletes the list right away and its items in a background job.
+    Returns 202 with the job; poll GET /api/jobs/<id> for its status.
+    """
     try:
         db.collection("lists").document(list_id).delete()
-        return ('', 204)
+        # The owner isn't known here, so drop every cached list query
+        doc_cache.invalidate_prefix(user_lists_key(''))
+        doc_cache.invalidate(list_items_key(list_id))
+
+        job = list_cleanup.start_list_delete(list_id)
+        return jsonify(job), 202, {'Location': f"/api/jobs/{job['id']}"}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    try:
+        job = list_cleanup.get_job(job_id)
+        if job is None:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(job), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/lists/<list_id>', methods=['PATCH'])
 def update_list(list_id):
     """ Updates a single list document (e.g., changes its name). """
@@ -136,12 +341,12 @@ def update_list(list_id):
         data = request.get_json() # e.g., { "name": "New List Name" }
         
         doc_ref = db.collection("lists").document(list_id)
-        
-        if not doc_ref.get().exists:
-            return jsonify({"error": "List not found"}), 404
-            
+        # update() only succeeds on an existing document, so no separate existence read
         doc_ref.update(data)
+        doc_cache.invalidate_prefix(user_lists_key(''))
         return jsonify({"message": "List updated"}), 200
+    except exceptions.NotFound:
+        return jsonify({"error": "List not found"}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -155,35 +360,77 @@ def create_list_item(list_id):
         data = request.get_json()
         data['createdAt'] = firestore.SERVER_TIMESTAMP
         
-        doc_ref = db.collection("lists").document(list_id).collection("items").add(data)
-        new_item = doc_ref[1].get().to_dict()
-        new_item['id'] = doc_ref[1].id
-        if 'createdAt' in new_item and isinstance(new_item['createdAt'], datetime):
-            new_item['createdAt'] = new_item['createdAt'].isoformat()
+        update_time, doc_ref = db.collection("lists").document(list_id).collection("items").add(data)
+        new_item = _created_document(data, doc_ref.id, update_time)
+        doc_cache.invalidate(list_items_key(list_id))
             
         return jsonify(new_item), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/lists/<list_id>/items', methods=['GET'])
-def get_list_items(list_id):
+@app.route('/api/lists/<list_id>/items:batch', methods=['POST'])
+def create_list_items_batch(list_id):
+    """
+    Creates up to 500 items in one atomic batch write: all of them or none.
+    EXPECTS: { "items": [{ "name": "Eggs", "purchased": false }, ...] }
+    """
     try:
-        items = []
+        data = request.get_json() or {}
+        items = data.get('items')
+        if not items or not isinstance(items, list):
+            return jsonify({"error": "Missing 'items' list in request"}), 400
+        if len(items) > MAX_BATCH_WRITES:
+            return jsonify({"error": f"At most {MAX_BATCH_WRITES} items per batch"}), 400
+        if not all(isinstance(item, dict) for item in items):
+            return jsonify({"error": "Every element of 'items' must be an object"}), 400
+
+        items_ref = db.collection("lists").document(list_id).collection("items")
+        batch = db.batch()
+        pending = []
+        for item in items:
+            item = dict(item)
+            item['createdAt'] = firestore.SERVER_TIMESTAMP
+            doc_ref = items_ref.document()
+            batch.set(doc_ref, item)
+            pending.append((doc_ref.id, item))
+
+        write_results = batch.commit()
+        new_items = [
+            _created_document(item, doc_id, result.update_time)
+            for (doc_id, item), result in zip(pending, write_results)
+        ]
+
+        doc_cache.invalidate(list_items_key(list_id))
+
+        return jsonify(new_items), 201
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _read_list_items(list_id):
+    def load():
         docs = db.collection("lists") \
                  .document(list_id) \
                  .collection("items") \
                  .order_by("createdAt", direction=firestore.Query.DESCENDING) \
                  .stream()
-        
-        for doc in docs:
-            item_data = doc.to_dict()
-            item_data['id'] = doc.id
-            if 'createdAt' in item_data and isinstance(item_data['createdAt'], datetime):
-                item_data['createdAt'] = item_data['createdAt'].isoformat()
-            
-            items.append(item_data)
-        return jsonify(items), 200
+        return _serialize_docs(docs)
+
+    return doc_cache.get_or_load(list_items_key(list_id), load)
+
+@app.route('/api/lists/<list_id>/items', methods=['GET'])
+def get_list_items(list_id):
+    try:
+        if not _has_page_args():
+            return _conditional_json(_read_list_items(list_id))
+
+        items_ref = db.collection("lists").document(list_id).collection("items")
+        query = items_ref.order_by("createdAt", direction=firestore.Query.DESCENDING)
+        query, limit = _apply_page_args(query, items_ref)
+
+        return _page_response(query.stream(), limit)
     
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except exceptions.FailedPrecondition as e:
         print(f"!!! MISSING INDEX: {e.message}")
         return jsonify({"error": "Database index error. Check backend console."}), 500
@@ -191,12 +438,60 @@ def get_list_items(list_id):
         print(f"An error occurred in get_list_items: {repr(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/lists/<list_id>/basket', methods=['GET'])
+def get_list_basket(list_id):
+    """
+    Prices every item on a list and picks the cheapest store for each.
+    EXPECTS: ?includePurchased=true to also price items already checked off
+    """
+    try:
+        include_purchased = request.args.get('includePurchased', 'false').lower() == 'true'
+        items = _read_list_items(list_id)
+        names = [item.get('name') or '' for item in items if include_purchased or not item.get('purchased')]
+        return jsonify(basket.price_basket(names)), 200
+
+    except Exception as e:
+        print(f"An error occurred in get_list_basket: {repr(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/lists/<list_id>/recipes', methods=['GET'])
+def get_list_recipes(list_id):
+    """
+    Ranks a user's recipes by how many of their ingredients are on this list.
+    EXPECTS: ?userId=abc[&limit=20]
+    Each recipe gets 'matchedIngredients' and 'missingIngredients'.
+    """
+    try:
+        user_id = request.args.get('userId')
+        if not user_id:
+            return jsonify({"error": "Missing 'userId' query parameter"}), 400
+        limit = int(request.args.get('limit', 20))
+
+        names = [item.get('name') or '' for item in _read_list_items(list_id)]
+        results = []
+        for doc, matched, missing in recipe_index.rank_by_shopping_list(user_id, names, limit):
+            recipe = _serialize_docs([doc])[0]
+            recipe['matchedIngredients'] = matched
+            recipe['missingIngredients'] = missing
+            results.append(recipe)
+        return jsonify(results), 200
+
+    except ValueError:
+        return jsonify({"error": "'limit' must be an integer"}), 400
+    except exceptions.FailedPrecondition as e:
+        print(f"!!! MISSING INDEX (Recipe ingredients): {e.message}")
+        return jsonify({"error": "Database index error. Check backend console."}), 500
+    except Exception as e:
+        print(f"An error occurred in get_list_recipes: {repr(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/lists/<list_id>/items/<item_id>', methods=['PATCH'])
 def update_list_item(list_id, item_id):
     try:
         data = request.get_json()
         doc_ref = db.collection("lists").document(list_id).collection("items").document(item_id)
         doc_ref.update(data)
+        doc_cache.invalidate(list_items_key(list_id))
         return jsonify({"message": "Item updated"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -206,6 +501,7 @@ def delete_list_item(list_id, item_id):
     try:
         doc_ref = db.collection("lists").document(list_id).collection("items").document(item_id)
         doc_ref.delete()
+        doc_cache.invalidate(list_items_key(list_id))
         return ('', 204)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -219,14 +515,10 @@ def create_recipe():
     try:
         data = request.get_json()
         data['createdAt'] = firestore.SERVER_TIMESTAMP
-        
-        doc_ref = db.collection("recipes").add(data)
+        recipe_index.with_index_fields(data)
 
-        # --- FIX ---
-        new_recipe = doc_ref[1].get().to_dict()
-        new_recipe['id'] = doc_ref[1].id
-        if 'createdAt' in new_recipe and isinstance(new_recipe['createdAt'], datetime):
-            new_recipe['createdAt'] = new_recipe['createdAt'].isoformat()
+        update_time, doc_ref = db.collection("recipes").add(data)
+        new_recipe = _created_document(data, doc_ref.id, update_time)
 
         return jsonify(new_recipe), 201
     except Exception as e:
@@ -239,21 +531,16 @@ def get_user_recipes():
         if not user_id:
             return jsonify({"error": "Missing 'userId' query parameter"}), 400
         
-        recipes = []
-        docs = db.collection('recipes') \
+        recipes_ref = db.collection('recipes')
+        query = recipes_ref \
                  .where('ownerId', '==', user_id) \
-                 .order_by("createdAt", direction=firestore.Query.DESCENDING) \
-                 .stream()
-                 
-        for doc in docs:
-            recipe_data = doc.to_dict()
-            recipe_data['id'] = doc.id
-            if 'createdAt' in recipe_data and isinstance(recipe_data['createdAt'], datetime):
-                recipe_data['createdAt'] = recipe_data['createdAt'].isoformat()
-            
-            recipes.append(recipe_data)
-        return jsonify(recipes), 200
+                 .order_by("createdAt", direction=firestore.Query.DESCENDING)
+        query, limit = _apply_page_args(query, recipes_ref)
+
+        return _page_response(query.stream(), limit)
         
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except exceptions.FailedPrecondition as e:
         print(f"!!! MISSING INDEX (Recipes): {e.message}")
         return jsonify({"error": "Database index error. Check backend console."}), 500
@@ -261,19 +548,42 @@ def get_user_recipes():
         print(f"An error occurred in get_user_recipes: {repr(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/recipes/with-ingredients', methods=['GET'])
+def get_recipes_with_ingredients():
+    """
+    A user's recipes that use every given ingredient, from the ingredient index.
+    EXPECTS: ?userId=abc&ingredient=eggs&ingredient=milk
+    """
+    try:
+        user_id = request.args.get('userId')
+        ingredients = [i for i in request.args.getlist('ingredient') if i.strip()]
+        if not user_id or not ingredients:
+            return jsonify({"error": "Missing 'userId' or 'ingredient' query parameter"}), 400
+
+        return jsonify(_serialize_docs(recipe_index.find_by_ingredients(user_id, ingredients))), 200
+
+    except exceptions.FailedPrecondition as e:
+        print(f"!!! MISSING INDEX (Recipe ingredients): {e.message}")
+        return jsonify({"error": "Database index error. Check backend console."}), 500
+    except Exception as e:
+        print(f"An error occurred in get_recipes_with_ingredients: {repr(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/recipes/<recipe_id>', methods=['GET'])
 def get_recipe(recipe_id):
-    try:
+    def load():
         doc = db.collection('recipes').document(recipe_id).get()
         if not doc.exists:
+            return None
+
+        return document_dict(doc)
+
+    try:
+        recipe_data = doc_cache.get_or_load(recipe_key(recipe_id), load)
+        if recipe_data is None:
             return jsonify({'error': 'Recipe not found'}), 404
             
-        recipe_data = doc.to_dict()
-        recipe_data['id'] = doc.id
-        if 'createdAt' in recipe_data and isinstance(recipe_data['createdAt'], datetime):
-            recipe_data['createdAt'] = recipe_data['createdAt'].isoformat()
-            
-        return jsonify(recipe_data)
+        return _conditional_json(recipe_data)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -301,9 +611,12 @@ def delete_recipe_route(recipe_id):
 @app.route('/api/recipes/random', methods=['GET'])
 def get_random_recipe_route():
     try:
-        recipe_str = recipe_functions.get_random_recipe()
-        # Convert the string to a dict and return as JSON
-        recipe_data = ast.literal_eval(recipe_str)
+        # Served from the pre-generated pool; only generate live when it's drained
+        recipe_data = recipe_pool.random_recipes.pop()
+        if recipe_data is None:
+            recipe_str = recipe_functions.get_random_recipe()
+            # Convert the string to a dict and return as JSON
+            recipe_data = recipe_functions.parse_recipe(recipe_str)
         return jsonify(recipe_data), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -320,11 +633,50 @@ def get_ingredient_recipe_route():
             return jsonify({"error": "Missing 'ingredients' list in request"}), 400
             
         recipe_str = recipe_functions.get_ingredient_recipe(ingredients)
-        recipe_data = ast.literal_eval(recipe_str)
+        recipe_data = recipe_functions.parse_recipe(recipe_str)
         return jsonify(recipe_data), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
+def _sse_response(fields):
+    """
+    Streams (event, data) pairs as Server-Sent Events. Errors after the
+    stream has started are reported as an 'error' event.
+    """
+    def events():
+        try:
+            for event, data in fields:
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/recipes/random/stream', methods=['GET'])
+def stream_random_recipe_route():
+    """
+    Streams a random recipe as SSE: 'name', 'ingredients' and 'instructions'
+    events as each field completes, then 'done' with the whole recipe.
+    """
+    return _sse_response(recipe_functions.stream_random_recipe())
+
+@app.route('/api/recipes/by-ingredients/stream', methods=['POST'])
+def stream_ingredient_recipe_route():
+    """
+    EXPECTS: { "ingredients": ["item1", "item2"] }
+    Same events as /api/recipes/random/stream.
+    """
+    data = request.get_json() or {}
+    ingredients = data.get('ingredients')
+    if not ingredients or not isinstance(ingredients, list):
+        return jsonify({"error": "Missing 'ingredients' list in request"}), 400
+
+    return _sse_response(recipe_functions.stream_ingredient_recipe(ingredients))
+    
 #######################################################
 # AI-Powered Price Ranking
 #######################################################
@@ -333,7 +685,8 @@ def get_ingredient_recipe_route():
 def rank_prices():
     """
     Takes a search query and a list of product results,
-    and returns the list FILTERED and SORTED by relevance using Gemini.
+    and returns the list FILTERED and SORTED by relevance.
+    The X-Rank-Path header says whether the local ranker or Gemini answered.
     """
     try:
         data = request.get_json()
@@ -343,11 +696,9 @@ def rank_prices():
         if not query or not results:
             return jsonify({"error": "Missing 'query' or 'results' in request"}), 400
 
-        # --- THIS IS THE FIX ---
-        # Call the new function
-        sorted_list = recipe_functions.filter_and_rank_products(query, results)
+        sorted_list, rank_path = recipe_functions.rank_products(query, results)
         
-        return jsonify(sorted_list), 200
+        return jsonify(sorted_list), 200, {'X-Rank-Path': rank_path}
 
     except Exception as e:
         return jsonify({"error": f"An error occurred while ranking: {str(e)}"}), 500
@@ -363,7 +714,7 @@ def get_prices():
         return jsonify({"error": "Missing 'grocery' query parameter"}), 400
 
     try:
-        results = get_food_prices(item) 
+        results = price_cache.get_prices(item)
         
         return jsonify({"grocery": item, "results": results})
 
@@ -374,6 +725,87 @@ def get_prices():
             "results": {}
         }), 500
 
+@app.route("/api/prices/search", methods=["GET"])
+def search_prices():
+    """
+    Fetches, flattens and ranks prices in one round trip.
+    Returns the final ranked list of { storeName, productName, productUrl, location, price, inStock }.
+    """
+    item = request.args.get("grocery")
+    if not item:
+        return jsonify({"error": "Missing 'grocery' query parameter"}), 400
+
+    try:
+        records = price_history.latest_price_records(price_cache.get_prices(item))
+    except Exception as e:
+        return jsonify({"error": f"An error occurred while fetching prices: {str(e)}"}), 500
+
+    if not records:
+        return jsonify([]), 200
+
+    try:
+        ranked, rank_path = recipe_functions.rank_products(item, records)
+    except Exception as e:
+        # If ranking fails, fall back to price order like the client used to
+        print(f"Ranking failed for '{item}', sorting by price: {e}")
+        ranked, rank_path = sorted(records, key=lambda r: r['price']), 'price'
+
+    return jsonify(ranked), 200, {'X-Rank-Path': rank_path}
+
+@app.route("/api/prices/suggest", methods=["GET"])
+def suggest_prices():
+    """
+    Typeahead over product names and queries the price API has answered.
+    EXPECTS: ?q=whole mi[&limit=8]
+    """
+    try:
+        limit = min(int(request.args.get("limit", 8)), 50)
+    except ValueError:
+        return jsonify({"error": "'limit' must be an integer"}), 400
+    return jsonify(product_index.suggest(request.args.get("q", ""), limit)), 200
+
+@app.route("/api/prices/history", methods=["GET"])
+def get_price_history():
+    """
+    Min / avg / max / latest price per product from the local price history.
+    EXPECTS: ?grocery=milk&days=30[&store=traderjoes]
+    """
+    item = request.args.get("grocery")
+    if not item:
+        return jsonify({"error": "Missing 'grocery' query parameter"}), 400
+
+    try:
+        days = int(request.args.get("days", 30))
+        store = request.args.get("store")
+        price_history.sync_prices(item)
+        trends = price_history.get_price_trends(item, days=days, store=store)
+        return jsonify({"grocery": item, "days": days, "trends": trends}), 200
+    except ValueError:
+        return jsonify({"error": "'days' must be an integer"}), 400
+    except Exception as e:
+        return jsonify({"error": f"An error occurred while reading price history: {str(e)}"}), 500
+
+@app.route("/api/prices/cache-stats", methods=["GET"])
+def get_price_cache_stats():
+    return jsonify(price_cache.stats()), 200
+
+@app.route("/api/prices/prewarm-stats", methods=["GET"])
+def get_price_prewarm_stats():
+    return jsonify(price_prewarm.stats()), 200
+
+@app.route("/api/prices/suggest/stats", methods=["GET"])
+def get_product_index_stats():
+    return jsonify(product_index.stats()), 200
+
+@app.route("/api/cache-stats", methods=["GET"])
+def get_doc_cache_stats():
+    return jsonify(doc_cache.stats()), 200
+
+@app.route("/api/prices/rank/cache-stats", methods=["GET"])
+def get_ranking_cache_stats():
+    return jsonify(ranker.ranking_cache.stats()), 200
+
 # --- Main entry point ---
+# Development only; in production run: gunicorn -c gunicorn.conf.py wsgi:app
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    app.run(debug=config.get('FLASK_DEBUG', '1') == '1', port=int(config.get('PORT', '5000')), threaded=True)
\ No newline at end of file
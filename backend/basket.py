@@ -0,0 +1,100 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import metrics
+import price_history
+import ranker
+from price_cache import price_cache
+from price_history import normalize_product_name
+
+# Distinct item names priced at once for a single basket.
+BASKET_MAX_WORKERS = int(config.get('BASKET_MAX_WORKERS', '8'))
+BASKET_MAX_ITEMS = int(config.get('BASKET_MAX_ITEMS', '100'))
+
+_executor = ThreadPoolExecutor(max_workers=BASKET_MAX_WORKERS, thread_name_prefix='basket')
+
+
+def _best_offers(name, results):
+    """
+    The best match per store for one item: the store's top product in the
+    local ranking. Never calls Gemini, so a big list can't queue on it.
+    """
+    records = price_history.latest_price_records(results)
+    ranked, _ = ranker.rank_locally(name, records)
+    offers = {}
+    for record in ranked:
+        offers.setdefault(record['storeName'], record)
+    return offers
+
+
+def _price_item(name):
+    try:
+        return _best_offers(name, price_cache.get_prices(name))
+    except Exception as e:
+        print(f"Basket pricing failed for '{name}': {e}")
+        return {}
+
+
+def price_basket(item_names):
+    """
+    Prices a whole shopping list at once. Names are normalized and
+    deduplicated (duplicates count towards the quantity), then priced
+    concurrently through the price cache.
+
+    Returns {items, stores, cheapestTotal, unpriced, truncated}: each item's
+    cheapest store, and for every store its total over the items it carries.
+    Only the first BASKET_MAX_ITEMS distinct names are priced; the rest are
+    listed in `truncated` and left out of every total.
+    """
+    quantities = OrderedDict()
+    labels = {}
+    for raw in item_names:
+        name = normalize_product_name(raw)
+        if not name:
+            continue
+        quantities[name] = quantities.get(name, 0) + 1
+        labels.setdefault(name, raw.strip())
+    names = list(quantities)[:BASKET_MAX_ITEMS]
+    truncated = [labels[name] for name in list(quantities)[BASKET_MAX_ITEMS:]]
+
+    items = []
+    stores = {}
+    unpriced = []
+    for name, offers in zip(names, _executor.map(metrics.in_request_context(_price_item), names)):
+        quantity = quantities[name]
+        for store, offer in offers.items():
+            totals = stores.setdefault(store, {'storeName': store, 'total': 0.0, 'itemsPriced': 0, 'missing': []})
+            totals['total'] += offer['price'] * quantity
+            totals['itemsPriced'] += 1
+
+        if not offers:
+            unpriced.append(labels[name])
+            items.append({'name': labels[name], 'quantity': quantity, 'cheapest': None, 'offers': []})
+            continue
+
+        by_price = sorted(offers.values(), key=lambda o: o['price'])
+        items.append({
+            'name': labels[name],
+            'quantity': quantity,
+            'cheapest': dict(by_price[0], lineTotal=round(by_price[0]['price'] * quantity, 2)),
+            'offers': by_price,
+        })
+
+    for item in items:
+        offered = {o['storeName'] for o in item['offers']}
+        for store, totals in stores.items():
+            if store not in offered:
+                totals['missing'].append(item['name'])
+
+    store_totals = sorted(stores.values(), key=lambda s: (len(s['missing']), s['total']))
+    for totals in store_totals:
+        totals['total'] = round(totals['total'], 2)
+
+    return {
+        'items': items,
+        'stores': store_totals,
+        'cheapestTotal': round(sum(i['cheapest']['lineTotal'] for i in items if i['cheapest']), 2),
+        'unpriced': unpriced,
+        'truncated': truncated,
+    }
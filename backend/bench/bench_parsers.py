@@ -0,0 +1,123 @@
+"""
+Parse-time benchmark for the store scrapers' HTML backends. Run from backend/:
+
+    python -m bench.bench_parsers --repeat 5
+
+Saved search pages in bench/fixtures/<store>.html (walmart, target, kroger)
+are used when present; otherwise a synthetic page of --size-mb megabytes is
+generated per store, with the product cards buried in filler markup the way
+the real pages are.
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+from bs4 import BeautifulSoup
+
+from scraper.parsing import PARSERS, extract_products
+from scraper.scrapers import KROGER_SPEC, TARGET_SPEC, WALMART_SPEC
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+SPECS = {'walmart': WALMART_SPEC, 'target': TARGET_SPEC, 'kroger': KROGER_SPEC}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='parses per backend and page')
+    parser.add_argument('--size-mb', type=float, default=2.0, help='size of each synthetic page')
+    parser.add_argument('--limit', type=int, default=5, help='products to extract')
+    parser.add_argument('--seed', type=int, default=1234)
+    return parser.parse_args()
+
+
+def _card(store, i, rng):
+    price = f"${rng.randint(1, 20)}.{rng.randint(0, 99):02d}"
+    if store == 'walmart':
+        return (f'<div class="mb1 ph1 pa0-xl"><a class="w_iUH7 link" href="/ip/{i}"><span>Product {i}</span></a>'
+                f'<div class="flex"><span class="price-group"><span>{price}</span></span></div></div>')
+    if store == 'target':
+        return (f'<div data-test="@web/site-top-of-funnel/ProductCardWrapper"><div data-test="product-title"><a href="/p/{i}">Product {i}</a></div>'
+                f'<div><span data-test="current-price"><span>{price}</span></span></div></div>')
+    return (f'<div class="AutoGrid-cell"><div class="ProductCard"><h3 class="ProductName">Product {i}</h3>'
+            f'<data data-qa="ProductPrice" value="{price[1:]}">{price}</data></div></div>')
+
+
+def synthetic_page(store, size_mb, rng):
+    """ Navigation, scripts and filler, with 60 product cards spread through the body. """
+    filler = ''.join(f'<div class="nav-{j}"><ul>' + ''.join(f'<li><a href="/c/{j}/{k}">Category {k}</a></li>' for k in range(20))
+                     + '</ul></div>' for j in range(20))
+    script = '<script>window.__DATA__ = ' + '{"k": "' + 'x' * 20000 + '"}</script>'
+    parts = ['<!DOCTYPE html><html><head><title>Search</title>', script, '</head><body>']
+    target = int(size_mb * 1024 * 1024)
+    size = sum(len(p) for p in parts)
+    i = 0
+    while size < target:
+        block = filler if i % 3 else filler + script
+        if i < 60:
+            block += _card(store, i, rng)
+        parts.append(block)
+        size += len(block)
+        i += 1
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+
+def load_pages(args):
+    rng = random.Random(args.seed)
+    pages = {}
+    for store in SPECS:
+        path = os.path.join(FIXTURES_DIR, f"{store}.html")
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                pages[store] = (f.read(), 'fixture')
+        else:
+            pages[store] = (synthetic_page(store, args.size_mb, rng), 'synthetic')
+    return pages
+
+
+def full_soup_baseline(html, spec, limit):
+    """ What the scrapers did before: a full html.parser tree, then select. """
+    soup = BeautifulSoup(html, "html.parser")
+    return soup.select(spec.item)[:limit]
+
+
+def time_runs(func, repeat):
+    runs = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        runs.append(time.perf_counter() - start)
+    return statistics.median(runs), result
+
+
+def main():
+    args = parse_args()
+    pages = load_pages(args)
+
+    header = f"{'store':8} {'source':10} {'size MB':>8} {'backend':22} {'median ms':>10} {'products':>9} {'speedup':>8}"
+    print(header)
+    print('-' * len(header))
+    for store, (html, source) in pages.items():
+        spec = SPECS[store]
+        size = len(html.encode('utf-8')) / 1024 / 1024
+        baseline, _ = time_runs(lambda: full_soup_baseline(html, spec, args.limit), args.repeat)
+        print(f"{store:8} {source:10} {size:>8.2f} {'full soup (before)':22} {baseline * 1000:>10.1f} {'':>9} {'1.0x':>8}")
+
+        expected = None
+        for name in ('html.parser', 'lxml', 'selectolax'):
+            if name not in PARSERS:
+                print(f"{store:8} {source:10} {size:>8.2f} {name:22} {'not installed':>10}")
+                continue
+            elapsed, products = time_runs(lambda: extract_products(html, spec, limit=args.limit, parser=name), args.repeat)
+            if expected is None:
+                expected = products
+            elif products != expected:
+                print(f"  warning: {name} extracted different products than html.parser")
+            print(f"{store:8} {source:10} {size:>8.2f} {name:22} {elapsed * 1000:>10.1f} {len(products):>9} {baseline / elapsed:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+"""
+In-memory stand-in for the parts of the Firestore client app.py uses,
+with an optional per-operation delay to mimic a network round trip.
+"""
+import itertools
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from firebase_admin import firestore
+from google.api_core import exceptions
+
+
+def _matches(actual, op, value):
+    if op == 'array_contains':
+        return isinstance(actual, list) and value in actual
+    if op == 'array_contains_any':
+        return isinstance(actual, list) and any(v in actual for v in value)
+    return actual == value
+
+
+class FakeWriteResult:
+    def __init__(self, update_time):
+        self.update_time = update_time
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, reference, data, fields=None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+        self._fields = fields
+
+    def to_dict(self):
+        if self._data is None:
+            return None
+        if self._fields is not None:
+            return {k: v for k, v in self._data.items() if k in self._fields}
+        return dict(self._data)
+
+    def get(self, field):
+        # Like the SDK: None for a missing document, KeyError for a missing field
+        data = self.to_dict()
+        if data is None:
+            return None
+        if field not in data:
+            raise KeyError(f"'{field}' is not contained in the data")
+        return data[field]
+
+
+class FakeDocumentReference:
+    def __init__(self, db, path):
+        self._db = db
+        self.path = path
+        self.id = path.rsplit('/', 1)[-1]
+
+    @property
+    def parent(self):
+        return FakeCollectionReference(self._db, self.path.rsplit('/', 1)[0])
+
+    def collection(self, name):
+        return FakeCollectionReference(self._db, f"{self.path}/{name}")
+
+    def get(self):
+        self._db._round_trip()
+        with self._db._lock:
+            data = self._db._docs.get(self.path)
+            return FakeDocumentSnapshot(self, dict(data) if data is not None else None)
+
+    def set(self, data):
+        self._db._round_trip()
+        return FakeWriteResult(self._db._write(self.path, data))
+
+    def update(self, data):
+        self._db._round_trip()
+        with self._db._lock:
+            if self.path not in self._db._docs:
+                raise exceptions.NotFound(f"No document to update: {self.path}")
+        return FakeWriteResult(self._db._write(self.path, data, merge=True))
+
+    def delete(self):
+        self._db._round_trip()
+        with self._db._lock:
+            self._db._docs.pop(self.path, None)
+        return FakeWriteResult(self._db._now())
+
+
+class FakeQuery:
+    def __init__(self, db, parent_path=None, group=None):
+        self._db = db
+        self._parent_path = parent_path
+        self._group = group
+        self._filters = []
+        self._orders = []
+        self._limit = None
+        self._start_after = None
+        self._fields = None
+
+    def _copy(self, **changes):
+        query = FakeQuery(self._db, self._parent_path, self._group)
+        query._filters = list(self._filters)
+        query._orders = list(self._orders)
+        query._limit = self._limit
+        query._start_after = self._start_after
+        query._fields = self._fields
+        for key, value in changes.items():
+            setattr(query, key, value)
+        return query
+
+    def where(self, field, op, value):
+        if op not in ('==', 'array_contains', 'array_contains_any'):
+            raise NotImplementedError(f"Fake Firestore doesn't support {op!r}")
+        return self._copy(_filters=self._filters + [(field, op, value)])
+
+    def order_by(self, field, direction=firestore.Query.ASCENDING):
+        return self._copy(_orders=self._orders + [(field, direction == firestore.Query.DESCENDING)])
+
+    def limit(self, count):
+        return self._copy(_limit=count)
+
+    def start_after(self, snapshot):
+        return self._copy(_start_after=snapshot.reference.path)
+
+    def select(self, fields):
+        return self._copy(_fields=set(fields))
+
+    def _matches(self, path):
+        parent, _, _ = path.rpartition('/')
+        if self._group is not None:
+            return parent.rsplit('/', 1)[-1] == self._group
+        return parent == self._parent_path
+
+    def stream(self):
+        self._db._round_trip()
+        with self._db._lock:
+            rows = [(path, dict(data)) for path, data in self._db._docs.items() if self._matches(path)]
+
+        rows = [r for r in rows if all(_matches(r[1].get(f), op, v) for f, op, v in self._filters)]
+        for field, descending in reversed(self._orders):
+            rows.sort(key=lambda r: (r[1].get(field) is None, r[1].get(field)), reverse=descending)
+
+        if self._start_after is not None:
+            paths = [r[0] for r in rows]
+            rows = rows[paths.index(self._start_after) + 1:] if self._start_after in paths else []
+        if self._limit is not None:
+            rows = rows[:self._limit]
+
+        for path, data in rows:
+            yield FakeDocumentSnapshot(FakeDocumentReference(self._db, path), data, self._fields)
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, db, path):
+        super().__init__(db, parent_path=path)
+        self.path = path
+        self.id = path.rsplit('/', 1)[-1]
+
+    @property
+    def parent(self):
+        if '/' not in self.path:
+            return None
+        return FakeDocumentReference(self._db, self.path.rsplit('/', 1)[0])
+
+    def document(self, doc_id=None):
+        return FakeDocumentReference(self._db, f"{self.path}/{doc_id or uuid.uuid4().hex[:20]}")
+
+    def add(self, data):
+        doc_ref = self.document()
+        return doc_ref.set(data).update_time, doc_ref
+
+
+class FakeWriteBatch:
+    def __init__(self, db):
+        self._db = db
+        self._ops = []
+
+    def set(self, doc_ref, data):
+        self._ops.append(('set', doc_ref.path, data))
+
+    def update(self, doc_ref, data):
+        self._ops.append(('update', doc_ref.path, data))
+
+    def delete(self, doc_ref):
+        self._ops.append(('delete', doc_ref.path, None))
+
+    def commit(self):
+        self._db._round_trip()
+        results = []
+        for op, path, data in self._ops:
+            if op == 'delete':
+                with self._db._lock:
+                    self._db._docs.pop(path, None)
+                results.append(FakeWriteResult(self._db._now()))
+            else:
+                results.append(FakeWriteResult(self._db._write(path, data, merge=(op == 'update'))))
+        return results
+
+
+class FakeFirestore:
+    """ Drop-in for firebase_setup.db. `latency` seconds are slept per round trip. """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self._docs = {}
+        self._lock = threading.Lock()
+        self._tick = itertools.count()
+        self.round_trips = 0
+
+    def _round_trip(self):
+        with self._lock:
+            self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _now(self):
+        # Strictly increasing, so createdAt ordering is stable between runs
+        return datetime.fromtimestamp(1_700_000_000 + next(self._tick) / 1000, tz=timezone.utc)
+
+    def _write(self, path, data, merge=False):
+        now = self._now()
+        resolved = {k: (now if v is firestore.SERVER_TIMESTAMP else v) for k, v in data.items()}
+        with self._lock:
+            if merge:
+                self._docs.setdefault(path, {}).update(resolved)
+            else:
+                self._docs[path] = resolved
+        return now
+
+    def collection(self, name):
+        return FakeCollectionReference(self, name)
+
+    def collection_group(self, name):
+        return FakeQuery(self, group=name)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def recursive_delete(self, reference, chunk_size=5000):
+        self._round_trip()
+        prefix = reference.path + '/'
+        with self._lock:
+            doomed = [p for p in self._docs if p.startswith(prefix) or p == reference.path]
+            for path in doomed:
+                del self._docs[path]
+        return len(doomed)
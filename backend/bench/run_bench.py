@@ -0,0 +1,244 @@
+"""
+Load test for the backend against local stand-ins for Firestore, Gemini and
+the price API. Run from backend/:
+
+    python -m bench.run_bench --flows 300 --concurrency 16 --out bench_results.json
+    python -m bench.run_bench --compare bench_results.json
+
+Every run uses the same seed, data set and stub latencies unless told
+otherwise, so results are comparable between commits.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import types
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+GROCERIES = ['milk', 'eggs', 'bread', 'butter', 'chicken breast', 'rice', 'apples', 'bananas',
+             'cheddar cheese', 'yogurt', 'spinach', 'tomatoes', 'pasta', 'coffee', 'avocados']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--flows', type=int, default=200, help='user flows to run in total')
+    parser.add_argument('--concurrency', type=int, default=16, help='flows running at once')
+    parser.add_argument('--mix', default='search=5,dashboard=3,recipes=2', help='relative weight of each flow')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--gemini-latency', type=float, default=1.0, help='seconds per Gemini call')
+    parser.add_argument('--price-latency', type=float, default=0.3, help='seconds per price API call')
+    parser.add_argument('--firestore-latency', type=float, default=0.01, help='seconds per Firestore round trip')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--out', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='print deltas against a previous --out file')
+    return parser.parse_args()
+
+
+def boot_backend(args):
+    """ Imports app.py with its upstreams replaced by the local stand-ins. """
+    workdir = tempfile.mkdtemp(prefix='food-zot-bench-')
+    os.environ['PRICE_HISTORY_DB'] = os.path.join(workdir, 'price_history.db')
+    os.environ.setdefault('PRICE_CACHE_DB', '')
+    os.environ.setdefault('PRODUCT_INDEX_SNAPSHOT', os.path.join(workdir, 'product_index.json'))
+    # Keep runs comparable: no background prewarming unless asked for
+    os.environ.setdefault('PRICE_PREWARM_INTERVAL', '0')
+
+    from bench.fake_firestore import FakeFirestore
+    from bench.stubs import FakeGeminiModel, PriceApiStub
+
+    from firebase_admin import firestore
+
+    db = FakeFirestore(latency=args.firestore_latency)
+    firebase_setup = types.ModuleType('firebase_setup')
+    firebase_setup.db = db
+    firebase_setup.firestore = firestore
+    firebase_setup.get_db = lambda: db
+    sys.modules['firebase_setup'] = firebase_setup
+
+    price_api = PriceApiStub(latency=args.price_latency).start()
+
+    import gemini_client
+    from scraper import scrapers
+    gemini_client._model = FakeGeminiModel(latency=args.gemini_latency)
+    scrapers.PRICE_QUERY_URL = price_api.url
+
+    from app import app
+    return app, db, price_api, gemini_client._model
+
+
+def seed_data(db, users, rng):
+    from firebase_admin import firestore
+
+    user_ids = []
+    for u in range(users):
+        uid = f"bench-user-{u}"
+        user_ids.append(uid)
+        db.collection('users').document(uid).set({'email': f"{uid}@example.com", 'name': '', 'createdAt': firestore.SERVER_TIMESTAMP})
+        for l in range(3):
+            _, list_ref = db.collection('lists').add({'name': f"List {l}", 'ownerId': uid, 'createdAt': firestore.SERVER_TIMESTAMP})
+            for _ in range(rng.randint(5, 25)):
+                list_ref.collection('items').add({'name': rng.choice(GROCERIES), 'purchased': False, 'createdAt': firestore.SERVER_TIMESTAMP})
+        for r in range(rng.randint(2, 8)):
+            db.collection('recipes').add({
+                'name': f"Recipe {r}", 'ownerId': uid, 'instructions': 'Mix well. ' * 50,
+                'ingredients': [{'name': g, 'amount': '1'} for g in rng.sample(GROCERIES, 4)],
+                'createdAt': firestore.SERVER_TIMESTAMP,
+            })
+    db.round_trips = 0
+    return user_ids
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def call(self, session, base_url, route, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = session.request(method, base_url + path, timeout=120, **kwargs)
+            ok = response.status_code < 400
+            body = response.json() if ok and response.content and 'json' in response.headers.get('Content-Type', '') else None
+        except Exception:
+            ok, body = False, None
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.latencies[route].append(elapsed)
+            if not ok:
+                self.errors[route] += 1
+        return body
+
+
+def search_flow(rec, session, base_url, rng, uid):
+    grocery = rng.choice(GROCERIES)
+    rec.call(session, base_url, 'GET /api/prices/search', 'GET', f"/api/prices/search?grocery={grocery}")
+
+
+def dashboard_flow(rec, session, base_url, rng, uid):
+    lists = rec.call(session, base_url, 'GET /api/dashboard', 'GET', f"/api/dashboard?userId={uid}") or []
+    if not lists:
+        return
+    target = rng.choice(lists)
+    items = target.get('items') or []
+    if items:
+        item = rng.choice(items)
+        rec.call(session, base_url, 'PATCH /api/lists/<id>/items/<id>', 'PATCH',
+                 f"/api/lists/{target['id']}/items/{item['id']}", json={'purchased': not item.get('purchased')})
+    rec.call(session, base_url, 'POST /api/lists/<id>/items', 'POST',
+             f"/api/lists/{target['id']}/items", json={'name': rng.choice(GROCERIES), 'purchased': False})
+
+
+def recipes_flow(rec, session, base_url, rng, uid):
+    recipes = rec.call(session, base_url, 'GET /api/recipes', 'GET', f"/api/recipes?userId={uid}") or []
+    if recipes:
+        rec.call(session, base_url, 'GET /api/recipes/<id>', 'GET', f"/api/recipes/{rng.choice(recipes)['id']}")
+    if rng.random() < 0.3:
+        rec.call(session, base_url, 'GET /api/recipes/random', 'GET', '/api/recipes/random')
+
+
+FLOWS = {'search': search_flow, 'dashboard': dashboard_flow, 'recipes': recipes_flow}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(rec, wall_time):
+    routes = {}
+    for route, values in sorted(rec.latencies.items()):
+        values = sorted(values)
+        routes[route] = {
+            'count': len(values),
+            'errors': rec.errors[route],
+            'p50_ms': round(percentile(values, 50) * 1000, 2),
+            'p95_ms': round(percentile(values, 95) * 1000, 2),
+            'p99_ms': round(percentile(values, 99) * 1000, 2),
+            'throughput_rps': round(len(values) / wall_time, 2),
+        }
+    return routes
+
+
+def print_report(routes, wall_time, previous=None):
+    header = f"{'route':38} {'count':>6} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8}"
+    print(header)
+    print('-' * len(header))
+    for route, r in routes.items():
+        line = f"{route:38} {r['count']:>6} {r['errors']:>4} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['throughput_rps']:>8}"
+        old = (previous or {}).get(route)
+        if old:
+            line += f"   p95 {r['p95_ms'] - old['p95_ms']:+.1f} ms"
+        print(line)
+    print(f"\nwall time {wall_time:.2f}s, {sum(r['count'] for r in routes.values()) / wall_time:.1f} req/s overall")
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+
+    import requests
+    from werkzeug.serving import make_server
+
+    app, db, price_api, gemini_model = boot_backend(args)
+    user_ids = seed_data(db, args.users, rng)
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    weights = {}
+    for part in args.mix.split(','):
+        name, _, weight = part.partition('=')
+        weights[name.strip()] = float(weight or 1)
+    flow_names = list(weights)
+    plan = [(rng.choices(flow_names, [weights[n] for n in flow_names])[0], rng.choice(user_ids), rng.random())
+            for _ in range(args.flows)]
+
+    rec = Recorder()
+    local = threading.local()
+
+    def run(step):
+        name, uid, flow_seed = step
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        FLOWS[name](rec, local.session, base_url, random.Random(flow_seed), uid)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(run, plan))
+    wall_time = time.perf_counter() - start
+
+    server.shutdown()
+    price_api.stop()
+
+    routes = summarize(rec, wall_time)
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)['routes']
+    print_report(routes, wall_time, previous)
+    print(f"upstream calls: firestore={db.round_trips} gemini={gemini_model.calls} price_api={price_api.requests}")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({
+                'config': {k: v for k, v in vars(args).items() if k not in ('out', 'compare')},
+                'wall_time_s': round(wall_time, 3),
+                'routes': routes,
+                'upstream_calls': {'firestore': db.round_trips, 'gemini': gemini_model.calls, 'price_api': price_api.requests},
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
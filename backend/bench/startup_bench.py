@@ -0,0 +1,111 @@
+"""
+Cold-start benchmark for the backend. Run from backend/:
+
+    python -m bench.startup_bench --runs 5 --budget-ms 600
+
+Each run is a fresh interpreter. It reports how long `import app` takes and
+how long a process takes from spawn to answering its first request, and
+exits non-zero when the median import time is over the budget
+(IMPORT_BUDGET_MS), so it can gate CI.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+import config
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = '''
+import time
+start = time.perf_counter()
+import app
+print(round((time.perf_counter() - start) * 1000, 1))
+'''
+
+SERVE_SNIPPET = '''
+import logging
+from werkzeug.serving import make_server
+from app import app
+logging.getLogger('werkzeug').setLevel(logging.ERROR)
+server = make_server('127.0.0.1', 0, app, threaded=True)
+print(server.server_port, flush=True)
+server.serve_forever()
+'''
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=float(config.get('IMPORT_BUDGET_MS', '600')),
+                        help='fail when the median `import app` time is above this')
+    parser.add_argument('--top', type=int, default=10, help='slowest imports to list (python -X importtime)')
+    return parser.parse_args()
+
+
+def child_env():
+    # No background jobs or snapshot files, and nothing that needs credentials
+    env = dict(os.environ, PRICE_PREWARM_INTERVAL='0', PRODUCT_INDEX_SNAPSHOT='', STARTUP_WARMUP='off')
+    env['PYTHONPATH'] = BACKEND_DIR + os.pathsep + env.get('PYTHONPATH', '')
+    return env
+
+
+def time_import():
+    out = subprocess.run([sys.executable, '-W', 'ignore', '-c', IMPORT_SNIPPET], cwd=BACKEND_DIR, env=child_env(),
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def time_first_request():
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, '-W', 'ignore', '-c', SERVE_SNIPPET], cwd=BACKEND_DIR, env=child_env(),
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        port = int(proc.stdout.readline())
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=30) as response:
+            response.read()
+        return round((time.perf_counter() - start) * 1000, 1)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def slowest_imports(top):
+    out = subprocess.run([sys.executable, '-W', 'ignore', '-X', 'importtime', '-c', 'import app'], cwd=BACKEND_DIR,
+                         env=child_env(), capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)', line)
+        # Direct imports of app only (two spaces of nesting)
+        if match and len(match.group(3)) == 2:
+            rows.append((int(match.group(2)) / 1000, match.group(4)))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    args = parse_args()
+    imports = [time_import() for _ in range(args.runs)]
+    first_requests = [time_first_request() for _ in range(args.runs)]
+
+    median_import = statistics.median(imports)
+    print(f"import app:          median {median_import:.1f} ms  (min {min(imports):.1f}, max {max(imports):.1f})")
+    print(f"spawn -> first 200:  median {statistics.median(first_requests):.1f} ms  "
+          f"(min {min(first_requests):.1f}, max {max(first_requests):.1f})")
+
+    print("\nslowest imports under app (cumulative ms):")
+    for ms, module in slowest_imports(args.top):
+        print(f"  {ms:>8.1f}  {module}")
+
+    if median_import > args.budget_ms:
+        print(f"\nFAIL: import time {median_import:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+        sys.exit(1)
+    print(f"\nOK: import time is within the {args.budget_ms:.0f} ms budget")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Local stand-ins for Gemini and the openpricengine price API.
+"""
+import ast
+import hashlib
+import json
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PRODUCT_VARIANTS = ['Organic {}', '{}', 'Large {}', '{} Family Pack', '{} Chips', '{} Flavored Snack', 'Store Brand {}']
+
+SAMPLE_RECIPE = {
+    'name': 'Benchmark Pasta',
+    'ingredients': [{'name': 'pasta', 'amount': '200g'}, {'name': 'tomato', 'amount': '3'}],
+    'instructions': 'Boil the pasta. ' * 40,
+}
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGeminiModel:
+    """ Mimics GenerativeModel.generate_content with a fixed delay per call. """
+
+    def __init__(self, latency=1.0, stream_chunks=8):
+        self.latency = latency
+        self.stream_chunks = stream_chunks
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _answer(self, prompt):
+        match = re.search(r'Here is a Python list of product names: (\[.*?\])\n', prompt, re.DOTALL)
+        if match:
+            # Ranking prompt: keep the products in the order given
+            return repr(ast.literal_eval(match.group(1)))
+        return json.dumps(SAMPLE_RECIPE)
+
+    def generate_content(self, prompt, stream=False, generation_config=None, request_options=None):
+        with self._lock:
+            self.calls += 1
+        text = self._answer(prompt)
+
+        if not stream:
+            time.sleep(self.latency)
+            return _Response(text)
+
+        def chunks():
+            step = max(1, len(text) // self.stream_chunks)
+            for i in range(0, len(text), step):
+                time.sleep(self.latency / self.stream_chunks)
+                yield _Response(text[i:i + step])
+        return chunks()
+
+
+def fake_products(product_name, store, start_date, end_date):
+    """ Deterministic products with a daily price history for a query. """
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    end = datetime.strptime(end_date, '%Y-%m-%d')
+    days = max((end - start).days, 0) + 1
+    title = product_name.strip().title()
+
+    products = []
+    for variant in PRODUCT_VARIANTS:
+        name = variant.format(title)
+        seed = int(hashlib.md5(f"{store}|{name}".encode()).hexdigest()[:6], 16)
+        base = 1 + (seed % 900) / 100
+        products.append({
+            'Store': store,
+            'Product Name': name,
+            'Product URL': f"https://example.com/{store}/{seed}",
+            'Country': 'USA',
+            'Price over time': [
+                {'Date': (start + timedelta(days=d)).strftime('%Y-%m-%d'), 'Price': round(base + d % 3 * 0.1, 2)}
+                for d in range(days)
+            ],
+        })
+    return products
+
+
+class PriceApiStub:
+    """ Threaded HTTP server that answers the price query endpoint after `latency` seconds. """
+
+    def __init__(self, latency=0.3):
+        stub = self
+        self.latency = latency
+        self.requests = 0
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                time.sleep(stub.latency)
+                params = parse_qs(urlparse(self.path).query)
+                store = params.get('stores', ['store'])[0]
+                today = datetime.now().strftime('%Y-%m-%d')
+                body = json.dumps(fake_products(
+                    params.get('productname', [''])[0],
+                    store,
+                    params.get('start_date', [today])[0],
+                    params.get('end_date', [today])[0],
+                )).encode()
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api/v1/multiple_stores/prices/query"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
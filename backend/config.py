@@ -0,0 +1,22 @@
+import os
+import threading
+
+from dotenv import load_dotenv
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def load():
+    """ Reads .env into the environment once per process; real env vars win. """
+    global _loaded
+    if not _loaded:
+        with _lock:
+            if not _loaded:
+                load_dotenv()
+                _loaded = True
+
+
+def get(name, default=None):
+    load()
+    return os.getenv(name, default)
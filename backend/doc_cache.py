@@ -0,0 +1,65 @@
+import config
+from ttl_cache import TTLCache
+
+# Short by default: each worker process has its own cache and only the worker
+# that handles a write invalidates it, so other workers may lag by up to this.
+DOC_CACHE_TTL = float(config.get('DOC_CACHE_TTL', '30'))
+DOC_CACHE_MAX_ENTRIES = int(config.get('DOC_CACHE_MAX_ENTRIES', '2048'))
+
+_MISSING = object()
+
+
+class DocumentCache:
+    """
+    Read-through LRU cache of serialized Firestore reads, keyed by document
+    path ("recipes/abc") or by a query name ("lists?ownerId=uid").
+    Write routes call invalidate() for every key they touch.
+    """
+
+    def __init__(self, max_entries=DOC_CACHE_MAX_ENTRIES, ttl=DOC_CACHE_TTL):
+        self._cache = TTLCache(max_entries, ttl)
+
+    def get_or_load(self, key, load):
+        """
+        Returns the cached value for `key`, or calls load() and caches its
+        result. A None result (document not found) is not cached.
+        """
+        value = self._cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        value = load()
+        if value is not None:
+            self._cache.set(key, value)
+        return value
+
+    def invalidate(self, *keys):
+        self._cache.invalidate(*keys)
+
+    def invalidate_prefix(self, prefix):
+        self._cache.invalidate_prefix(prefix)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+doc_cache = DocumentCache()
+
+
+def recipe_key(recipe_id):
+    return f"recipes/{recipe_id}"
+
+
+def user_key(user_id):
+    return f"users/{user_id}"
+
+
+def user_lists_key(user_id):
+    return f"lists?ownerId={user_id}"
+
+
+def list_items_key(list_id):
+    return f"lists/{list_id}/items"
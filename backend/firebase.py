@@ -1,10 +1,3 @@
-import firebase_admin
-from firebase_admin import firestore, credentials
-import json
-
-with open('./firebase.json', 'r') as f:
-    FIREBASE_JSON = json.load(f)
-
-cred = credentials.Certificate(FIREBASE_JSON)
-firebase_admin.initialize_app(cred)
-db = firestore.client()
+# Legacy module kept for grocery_functions.py. It used to initialize Firebase
+# a second time from ./firebase.json; it now shares firebase_setup's client.
+from firebase_setup import db
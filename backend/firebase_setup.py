@@ -1,19 +1,49 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
-import os
+import importlib
 import json
-from dotenv import load_dotenv
+import threading
 
-load_dotenv()
+import config
 
-service_account_str = os.getenv('FIREBASE_SERVICE_ACCOUNT_JSON')
+_db = None
+_db_lock = threading.Lock()
 
-if not service_account_str:
-    raise ValueError("FIREBASE_SERVICE_ACCOUNT_JSON is not set in your .env file!")
 
-service_account_dict = json.loads(service_account_str)
+def get_db():
+    """
+    Initializes the Firebase app and builds the Firestore client on first
+    use, so importing the backend doesn't pay for either.
+    """
+    global _db
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                import firebase_admin
+                from firebase_admin import credentials, firestore
+                import metrics
 
-cred = credentials.Certificate(service_account_dict)
-firebase_admin.initialize_app(cred)
+                if not firebase_admin._apps:
+                    service_account_str = config.get('FIREBASE_SERVICE_ACCOUNT_JSON')
+                    if not service_account_str:
+                        raise ValueError("FIREBASE_SERVICE_ACCOUNT_JSON is not set in your .env file!")
+                    cred = credentials.Certificate(json.loads(service_account_str))
+                    firebase_admin.initialize_app(cred)
 
-db = firestore.client()
\ No newline at end of file
+                metrics.instrument_firestore()
+                _db = firestore.client()
+    return _db
+
+
+class _Lazy:
+    """ Stands in for an object that is only built on first attribute access. """
+
+    def __init__(self, load):
+        self._load = load
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+
+# `from firebase_setup import db, firestore` works as before; nothing is
+# imported or connected until a route first touches them.
+db = _Lazy(get_db)
+firestore = _Lazy(lambda: importlib.import_module('firebase_admin.firestore'))
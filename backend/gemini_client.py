@@ -0,0 +1,143 @@
+import threading
+
+import config
+from metrics import timed
+
+GEMINI_API_KEY = config.get('API_KEY')
+GEMINI_MODEL = config.get('GEMINI_MODEL', 'gemini-2.5-flash')
+# Upper bound on Gemini calls in flight from this process.
+GEMINI_MAX_CONCURRENCY = int(config.get('GEMINI_MAX_CONCURRENCY', '8'))
+# Seconds before a single generate_content call is abandoned.
+GEMINI_TIMEOUT = float(config.get('GEMINI_TIMEOUT', '30'))
+
+_model = None
+_model_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(GEMINI_MAX_CONCURRENCY)
+
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+_stats = {'calls': 0, 'coalesced': 0, 'errors': 0}
+
+
+class GeminiBusyError(RuntimeError):
+    """ Raised when no concurrency slot frees up before the timeout. """
+
+
+def get_model():
+    """
+    Configures the SDK and builds the model once, on first use. The SDK is
+    imported here too, since it alone takes most of a second to import.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                import google.generativeai as genai
+                genai.configure(api_key=GEMINI_API_KEY)
+                _model = genai.GenerativeModel(GEMINI_MODEL)
+    return _model
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.text = None
+        self.error = None
+
+
+def _generation_config(json_output):
+    return {'response_mime_type': 'application/json'} if json_output else None
+
+
+def _generate(prompt, timeout, json_output=False):
+    if not _slots.acquire(timeout=timeout):
+        raise GeminiBusyError(f"No Gemini slot free after {timeout}s")
+    try:
+        with _in_flight_lock:
+            _stats['calls'] += 1
+        with timed('gemini', 'generate_content'):
+            response = get_model().generate_content(
+                prompt,
+                generation_config=_generation_config(json_output),
+                request_options={'timeout': timeout}
+            )
+            return response.text
+    except Exception:
+        with _in_flight_lock:
+            _stats['errors'] += 1
+        raise
+    finally:
+        _slots.release()
+
+
+def generate_text(prompt: str, timeout=GEMINI_TIMEOUT, coalesce=True, json_output=False) -> str:
+    """
+    Returns the model's text for a prompt.
+
+    With coalesce=True, concurrent callers sending the identical prompt share
+    one in-flight request (single-flight). Pass coalesce=False where callers
+    expect different answers to the same prompt, e.g. random recipes.
+    json_output=True asks Gemini for a JSON response instead of free text.
+    """
+    if not coalesce:
+        return _generate(prompt, timeout, json_output)
+
+    key = (prompt, json_output)
+    with _in_flight_lock:
+        call = _in_flight.get(key)
+        leader = call is None
+        if leader:
+            call = _in_flight[key] = _Call()
+        else:
+            _stats['coalesced'] += 1
+
+    if not leader:
+        if not call.done.wait(timeout):
+            raise TimeoutError(f"Gemini call did not finish within {timeout}s")
+        if call.error is not None:
+            raise call.error
+        return call.text
+
+    try:
+        call.text = _generate(prompt, timeout, json_output)
+        return call.text
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+        call.done.set()
+
+
+def stream_text(prompt: str, timeout=GEMINI_TIMEOUT, json_output=False):
+    """ Yields the response text chunk by chunk as Gemini produces it. Never coalesced. """
+    if not _slots.acquire(timeout=timeout):
+        raise GeminiBusyError(f"No Gemini slot free after {timeout}s")
+    try:
+        with _in_flight_lock:
+            _stats['calls'] += 1
+        with timed('gemini', 'stream_content'):
+            response = get_model().generate_content(
+                prompt,
+                stream=True,
+                generation_config=_generation_config(json_output),
+                request_options={'timeout': timeout}
+            )
+            for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+    except Exception:
+        with _in_flight_lock:
+            _stats['errors'] += 1
+        raise
+    finally:
+        _slots.release()
+
+
+def stats():
+    with _in_flight_lock:
+        stats = dict(_stats)
+        stats['in_flight'] = len(_in_flight)
+    stats['max_concurrency'] = GEMINI_MAX_CONCURRENCY
+    return stats
@@ -0,0 +1,33 @@
+import multiprocessing
+
+# Not `config`: gunicorn reads that name in this file as its own setting
+import config as app_config
+
+# Cooperative (gevent) workers: a request waiting on Gemini, Firestore or the
+# price API yields instead of pinning an OS thread, so each worker process
+# can hold hundreds of slow upstream calls at once.
+bind = app_config.get('BIND', f"0.0.0.0:{app_config.get('PORT', '5000')}")
+worker_class = app_config.get('WORKER_CLASS', 'gevent')
+workers = int(app_config.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+# Concurrent requests per gevent worker.
+worker_connections = int(app_config.get('WORKER_CONNECTIONS', '1000'))
+# Only used by the sync/gthread worker classes.
+threads = int(app_config.get('THREADS', '8'))
+
+# Long enough for a full Gemini generation or an SSE recipe stream.
+timeout = int(app_config.get('WORKER_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_worker_init(worker):
+    # The Firestore and Gemini clients use gRPC, which must be told to
+    # cooperate with gevent or its calls still block the whole worker. This
+    # has to run after the worker has monkey-patched the standard library,
+    # which gevent workers do after post_fork.
+    if worker_class == 'gevent':
+        import grpc.experimental.gevent as grpc_gevent
+        grpc_gevent.init_gevent()
@@ -0,0 +1,114 @@
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import config
+from firebase_setup import db
+
+# How many list deletions run at once; each one is itself a bulk writer.
+LIST_DELETE_WORKERS = int(config.get('LIST_DELETE_WORKERS', '2'))
+# Documents fetched per page while walking a subcollection to delete it.
+LIST_DELETE_CHUNK_SIZE = int(config.get('LIST_DELETE_CHUNK_SIZE', '500'))
+# Job records carry an `expireAt` this many days out, for a Firestore TTL policy on `jobs`.
+JOB_RECORD_TTL_DAYS = int(config.get('JOB_RECORD_TTL_DAYS', '7'))
+
+_executor = ThreadPoolExecutor(max_workers=LIST_DELETE_WORKERS, thread_name_prefix='list-delete')
+
+
+def delete_list_items(list_id):
+    """
+    Deletes every document under lists/<list_id> (its items) with a bulk
+    writer. Returns the number of documents deleted.
+    """
+    items_ref = db.collection('lists').document(list_id).collection('items')
+    return db.recursive_delete(items_ref, chunk_size=LIST_DELETE_CHUNK_SIZE)
+
+
+def _job_ref(job_id):
+    # In Firestore rather than worker memory, so any gunicorn worker can answer a poll
+    return db.collection('jobs').document(job_id)
+
+
+def _record(job_id, **fields):
+    try:
+        _job_ref(job_id).update(fields)
+    except Exception as e:
+        # A lost status update shouldn't stop the deletion itself
+        print(f"Failed to update job {job_id}: {repr(e)}")
+
+
+def _run_delete(job_id, list_id):
+    _record(job_id, status='running')
+    try:
+        deleted = delete_list_items(list_id)
+        _record(job_id, status='done', deleted=deleted, finishedAt=time.time())
+    except Exception as e:
+        print(f"Failed to delete items of list {list_id}: {repr(e)}")
+        _record(job_id, status='failed', error=str(e), finishedAt=time.time())
+
+
+def start_list_delete(list_id):
+    """
+    Queues deletion of a list's items subcollection; returns the job record.
+    The deletion runs in this worker, so a restart mid-job leaves the record
+    'running' and the rest of the items for sweep_orphaned_items().
+    """
+    job_id = uuid.uuid4().hex
+    job = {
+        'id': job_id,
+        'listId': list_id,
+        'status': 'queued',
+        'deleted': 0,
+        'error': None,
+        'startedAt': time.time(),
+        'finishedAt': None,
+    }
+    expire_at = datetime.now(timezone.utc) + timedelta(days=JOB_RECORD_TTL_DAYS)
+    _job_ref(job_id).set(dict(job, expireAt=expire_at))
+
+    _executor.submit(_run_delete, job_id, list_id)
+    return dict(job)
+
+
+def get_job(job_id):
+    doc = _job_ref(job_id).get()
+    if not doc.exists:
+        return None
+    job = doc.to_dict()
+    job.pop('expireAt', None)
+    return job
+
+
+def sweep_orphaned_items():
+    """
+    Deletes items whose parent list document no longer exists, e.g. lists
+    removed before deletion cleaned up their subcollection.
+    Returns {list_id: documents_deleted}.
+    """
+    list_exists = {}
+    orphaned = []
+    for item in db.collection_group('items').select([]).stream():
+        list_ref = item.reference.parent.parent
+        if list_ref is None or list_ref.parent.id != 'lists':
+            continue
+        if list_ref.id not in list_exists:
+            list_exists[list_ref.id] = list_ref.get().exists
+            if not list_exists[list_ref.id]:
+                orphaned.append(list_ref.id)
+
+    deleted = {}
+    for list_id, count in zip(orphaned, _executor.map(delete_list_items, orphaned)):
+        deleted[list_id] = count
+        print(f"Deleted {count} orphaned items of list {list_id}")
+    return deleted
+
+
+if __name__ == "__main__":
+    # Maintenance: python list_cleanup.py sweep
+    if len(sys.argv) > 1 and sys.argv[1] == 'sweep':
+        results = sweep_orphaned_items()
+        print(f"Swept {sum(results.values())} items from {len(results)} deleted lists")
+    else:
+        print("Usage: python list_cleanup.py sweep")
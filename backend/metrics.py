@@ -0,0 +1,230 @@
+import functools
+import json
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import ExitStack, contextmanager
+
+import config
+
+# Requests slower than this (seconds) are logged with their upstream breakdown.
+SLOW_REQUEST_SECONDS = float(config.get('SLOW_REQUEST_SECONDS', '1.0'))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+try:
+    # Optional: spans are only emitted when OpenTelemetry is installed and configured
+    from opentelemetry import trace as _otel_trace
+    _tracer = _otel_trace.get_tracer('food-for-zot')
+except ImportError:
+    _tracer = None
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # labels -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for labels, series in items:
+            base = _labels(self.label_names, labels)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {series[-2]}')
+            lines.append(f'{self.name}_count{{{base}}} {series[-2]}')
+            lines.append(f'{self.name}_sum{{{base}}} {series[-1]:.6f}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f'{self.name}{{{_labels(self.label_names, labels)}}} {value}')
+        return lines
+
+
+def _labels(names, values):
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"') for v in values)
+    return ','.join(f'{n}="{v}"' for n, v in zip(names, escaped))
+
+
+request_latency = Histogram('http_request_duration_seconds', 'Latency of each route.', ('method', 'route', 'status'))
+request_errors = Counter('http_request_errors_total', 'Responses with a 5xx status.', ('method', 'route'))
+upstream_latency = Histogram('upstream_call_duration_seconds', 'Latency of calls to Gemini, Firestore, the price API and scraped stores.', ('upstream', 'operation'))
+upstream_errors = Counter('upstream_call_errors_total', 'Upstream calls that raised.', ('upstream', 'operation'))
+
+_request_state = threading.local()
+
+
+########### TIMERS ############
+
+@contextmanager
+def timed(upstream, operation):
+    """ Times one upstream call and counts it as an error if it raises. """
+    span = _tracer.start_as_current_span(f"{upstream}.{operation}") if _tracer else None
+    if span is not None:
+        span.__enter__()
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        # Not BaseException: a stream closed early raises GeneratorExit, which isn't a failure
+        upstream_errors.inc(upstream, operation)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        upstream_latency.observe(elapsed, upstream, operation)
+        calls = getattr(_request_state, 'calls', None)
+        if calls is not None:
+            calls.append((f"{upstream}.{operation}", elapsed))
+        if span is not None:
+            span.__exit__(None, None, None)
+
+
+def _timed_iterator(iterator, stack):
+    # Streams are timed until exhausted or closed, not just until they're created
+    with stack:
+        yield from iterator
+
+
+def instrument(upstream, operation):
+    """
+    Decorator form of timed(). Iterator results (generators, and Firestore's
+    StreamGenerator) are timed through to exhaustion as one call.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with ExitStack() as stack:
+                stack.enter_context(timed(upstream, operation))
+                result = func(*args, **kwargs)
+                if isinstance(result, Iterator):
+                    return _timed_iterator(result, stack.pop_all())
+                return result
+        return wrapper
+    return decorator
+
+
+def in_request_context(func):
+    """
+    Wraps `func` so calls it makes on an executor thread are still counted
+    in the slow-request breakdown of the request that submitted it.
+    """
+    calls = getattr(_request_state, 'calls', None)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        outer = getattr(_request_state, 'calls', None)
+        _request_state.calls = calls
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _request_state.calls = outer
+    return wrapper
+
+
+_firestore_instrumented = False
+
+
+def instrument_firestore():
+    """
+    Wraps the Firestore client's network methods so every call site is timed
+    without touching the routes. Safe to call more than once.
+    """
+    global _firestore_instrumented
+    if _firestore_instrumented:
+        return
+    from google.cloud.firestore_v1 import batch, client, document, query
+
+    targets = [
+        (document.DocumentReference, ('get', 'create', 'set', 'update', 'delete')),
+        (query.Query, ('stream', 'get')),
+        (batch.WriteBatch, ('commit',)),
+        (client.Client, ('recursive_delete',)),
+    ]
+    for cls, methods in targets:
+        for name in methods:
+            original = getattr(cls, name, None)
+            if original is not None:
+                setattr(cls, name, instrument('firestore', f"{cls.__name__}.{name}")(original))
+    _firestore_instrumented = True
+
+
+########### FLASK ############
+
+def init_app(app):
+    """ Records per-route latency and errors, and logs slow requests. """
+    from flask import request
+
+    @app.before_request
+    def _start_timer():
+        _request_state.start = time.perf_counter()
+        _request_state.calls = []
+
+    @app.after_request
+    def _record(response):
+        start = getattr(_request_state, 'start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+
+        request_latency.observe(elapsed, request.method, route, response.status_code)
+        if response.status_code >= 500:
+            request_errors.inc(request.method, route)
+
+        if elapsed >= SLOW_REQUEST_SECONDS:
+            upstream = {}
+            for name, seconds in _request_state.calls:
+                upstream[name] = round(upstream.get(name, 0) + seconds * 1000, 2)
+            print(json.dumps({
+                'event': 'slow_request',
+                'method': request.method,
+                'route': route,
+                'path': request.full_path.rstrip('?'),
+                'status': response.status_code,
+                'duration_ms': round(elapsed * 1000, 2),
+                'upstream_ms': upstream,
+            }))
+
+        _request_state.start = None
+        _request_state.calls = None
+        return response
+
+
+def render():
+    lines = []
+    for metric in (request_latency, request_errors, upstream_latency, upstream_errors):
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,375 @@
+import json
+import sqlite3
+import threading
+import time
+
+import config
+from scraper.scrapers import USA_STORES
+import price_history
+from price_history import normalize_product_name
+from product_index import product_index
+from ttl_cache import TTLCache
+
+PRICE_CACHE_TTL = float(config.get('PRICE_CACHE_TTL', '900'))
+# How long past its TTL an entry may still be served while a refresh runs
+# in the background. 0 disables stale-while-revalidate.
+PRICE_CACHE_STALE_TTL = float(config.get('PRICE_CACHE_STALE_TTL', '3600'))
+# Empty results are cached briefly so a store outage doesn't pin "no results".
+PRICE_CACHE_EMPTY_TTL = float(config.get('PRICE_CACHE_EMPTY_TTL', '60'))
+PRICE_CACHE_MAX_ENTRIES = int(config.get('PRICE_CACHE_MAX_ENTRIES', '1024'))
+# Optional SQLite file shared by every worker process on the host.
+PRICE_CACHE_DB = config.get('PRICE_CACHE_DB', '')
+# With PRICE_CACHE_DB, how often (seconds) a worker reloads the prewarmed key
+# set and adds its prewarm hit counts to the shared totals.
+PRICE_CACHE_PREWARM_SYNC = float(config.get('PRICE_CACHE_PREWARM_SYNC', '10'))
+
+
+class PriceCache:
+    """
+    Bounded LRU cache of per-store price lookups with TTL expiry.
+
+    Entries live in memory and, when `db_path` is set, in a SQLite file as a
+    second level so several gunicorn workers share each other's hits. The
+    prewarm job's keys, run summary and hit counts are kept in the same file,
+    so any worker can report them.
+    """
+
+    def __init__(self, max_entries=PRICE_CACHE_MAX_ENTRIES, ttl=PRICE_CACHE_TTL,
+                 stale_ttl=PRICE_CACHE_STALE_TTL, empty_ttl=PRICE_CACHE_EMPTY_TTL,
+                 db_path=PRICE_CACHE_DB):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.empty_ttl = empty_ttl
+        self.db_path = db_path
+
+        # Freshness depends on the value and the stale window, so lookup() applies it
+        self._entries = TTLCache(max_entries)  # key -> (fetched_at, value)
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._prewarmed = set()  # keys the prewarm job has filled
+        self._prewarm_pending = {'prewarmed_lookups': 0, 'prewarmed_hits': 0}  # not yet in the shared totals
+        self._prewarm_synced_at = 0.0
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'shared_hits': 0,
+                       'prewarmed_lookups': 0, 'prewarmed_hits': 0}
+
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS price_cache ('
+                    'key TEXT PRIMARY KEY, value TEXT NOT NULL, fetched_at REAL NOT NULL)'
+                )
+                conn.execute('CREATE TABLE IF NOT EXISTS prewarmed_keys (key TEXT PRIMARY KEY)')
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS prewarm_state ('
+                    'name TEXT PRIMARY KEY, value TEXT NOT NULL)'
+                )
+
+    # --- Keys and storage ---
+
+    @staticmethod
+    def make_key(product_name, store, currency="Default"):
+        return f"{normalize_product_name(product_name)}|{store}|{currency}"
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _ttl_for(self, value):
+        return self.ttl if value else self.empty_ttl
+
+    def _read(self, key):
+        entry = self._entries.get_entry(key)
+        if entry is not None:
+            return entry
+
+        if not self.db_path:
+            return None
+
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    'SELECT value, fetched_at FROM price_cache WHERE key = ?', (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Price cache read failed: {e}")
+            return None
+
+        if row is None:
+            return None
+
+        entry = (row[1], json.loads(row[0]))
+        self._entries.set(key, entry[1], stored_at=entry[0])
+        with self._lock:
+            self._stats['shared_hits'] += 1
+        return entry
+
+    def set(self, key, value, fetched_at=None):
+        entry = (fetched_at or time.time(), value)
+        self._entries.set(key, value, stored_at=entry[0])
+
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        'INSERT OR REPLACE INTO price_cache (key, value, fetched_at) VALUES (?, ?, ?)',
+                        (key, json.dumps(value), entry[0])
+                    )
+            except sqlite3.Error as e:
+                print(f"Price cache write failed: {e}")
+
+    def invalidate(self, key):
+        self._entries.invalidate(key)
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute('DELETE FROM price_cache WHERE key = ?', (key,))
+            except sqlite3.Error as e:
+                print(f"Price cache delete failed: {e}")
+
+    def clear(self):
+        self._entries.clear()
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM price_cache')
+
+    # --- Lookups ---
+
+    def lookup(self, key):
+        """
+        Returns (status, value) where status is 'fresh', 'stale' or 'miss'.
+        """
+        entry = self._read(key)
+        if entry is None:
+            return 'miss', None
+
+        fetched_at, value = entry
+        age = time.time() - fetched_at
+        ttl = self._ttl_for(value)
+        if age < ttl:
+            return 'fresh', value
+        if value and age < ttl + self.stale_ttl:
+            return 'stale', value
+        return 'miss', None
+
+    def _fetch(self, product_name, currency, stores):
+        """
+        Fetches from the price history, caches the result and feeds the
+        typeahead index. An empty result never replaces prices that can
+        still be served stale; they're returned instead and the next lookup
+        retries. A [] standing in for an error or timeout isn't cached at all.
+        """
+        fetched = price_history.get_prices(product_name, currency, stores=stores)
+        product_index.add_results(product_name, fetched)
+        failed = getattr(fetched, 'failed', ())
+        results = {}
+        for store, value in fetched.items():
+            key = self.make_key(product_name, store, currency)
+            if not value:
+                status, previous = self.lookup(key)
+                if status != 'miss' and previous:
+                    print(f"Keeping cached prices for '{product_name}' at {store}; refresh came back empty")
+                    results[store] = previous
+                    continue
+                if store in failed:
+                    results[store] = value
+                    continue
+            self.set(key, value)
+            results[store] = value
+        return results
+
+    def _refresh_in_background(self, product_name, currency, stores):
+        with self._lock:
+            stores = [s for s in stores if self.make_key(product_name, s, currency) not in self._refreshing]
+            self._refreshing.update(self.make_key(product_name, s, currency) for s in stores)
+        if not stores:
+            return
+
+        def refresh():
+            try:
+                self._fetch(product_name, currency, stores)
+            except Exception as e:
+                print(f"Background price refresh failed for '{product_name}': {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.difference_update(
+                        self.make_key(product_name, s, currency) for s in stores
+                    )
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def warm(self, product_name, currency="Default", stores=None):
+        """
+        Fetches and caches the stores whose entries aren't fresh. Returns the
+        number of stores fetched (0 when everything was already warm).
+        """
+        stores = stores or USA_STORES
+        keys = {store: self.make_key(product_name, store, currency) for store in stores}
+        cold = [store for store, key in keys.items() if self.lookup(key)[0] != 'fresh']
+        if cold:
+            self._fetch(product_name, currency, cold)
+        with self._lock:
+            self._prewarmed.update(keys.values())
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    conn.executemany('INSERT OR IGNORE INTO prewarmed_keys (key) VALUES (?)',
+                                     [(key,) for key in keys.values()])
+            except sqlite3.Error as e:
+                print(f"Price cache prewarm write failed: {e}")
+        return len(cold)
+
+    def forget_prewarmed(self, keep):
+        """ Stops attributing hits to prewarming for keys outside `keep`. """
+        with self._lock:
+            self._prewarmed.intersection_update(keep)
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    stored = {row[0] for row in conn.execute('SELECT key FROM prewarmed_keys')}
+                    conn.executemany('DELETE FROM prewarmed_keys WHERE key = ?',
+                                     [(key,) for key in stored - set(keep)])
+            except sqlite3.Error as e:
+                print(f"Price cache prewarm write failed: {e}")
+
+    def _sync_prewarm(self, force=False):
+        """
+        Adds this worker's prewarm hit counts to the shared totals and reloads
+        the prewarmed keys, at most every PRICE_CACHE_PREWARM_SYNC seconds.
+        """
+        if not self.db_path:
+            return
+        with self._lock:
+            now = time.time()
+            if not force and now - self._prewarm_synced_at < PRICE_CACHE_PREWARM_SYNC:
+                return
+            self._prewarm_synced_at = now
+            pending = dict(self._prewarm_pending)
+            self._prewarm_pending = dict.fromkeys(pending, 0)
+
+        try:
+            with self._connect() as conn:
+                for name, count in pending.items():
+                    if count:
+                        self._add_counter(conn, name, count)
+                keys = {row[0] for row in conn.execute('SELECT key FROM prewarmed_keys')}
+        except sqlite3.Error as e:
+            print(f"Price cache prewarm sync failed: {e}")
+            with self._lock:
+                for name, count in pending.items():
+                    self._prewarm_pending[name] += count
+            return
+        with self._lock:
+            self._prewarmed = keys
+
+    @staticmethod
+    def _add_counter(conn, name, count):
+        conn.execute(
+            'INSERT INTO prewarm_state (name, value) VALUES (?, ?) '
+            'ON CONFLICT (name) DO UPDATE SET value = CAST(value AS INTEGER) + excluded.value',
+            (name, count)
+        )
+
+    def record_prewarm_run(self, summary):
+        """ Stores a prewarm run's summary where every worker can read it. """
+        if not self.db_path:
+            return
+        try:
+            with self._connect() as conn:
+                self._add_counter(conn, 'runs', 1)
+                conn.execute('INSERT OR REPLACE INTO prewarm_state (name, value) VALUES (?, ?)',
+                             ('last_run', json.dumps(summary)))
+        except sqlite3.Error as e:
+            print(f"Price cache prewarm write failed: {e}")
+
+    def prewarm_runs(self):
+        """ (runs, last run summary) from the shared file, or None without one. """
+        if not self.db_path:
+            return None
+        try:
+            with self._connect() as conn:
+                state = dict(conn.execute(
+                    "SELECT name, value FROM prewarm_state WHERE name IN ('runs', 'last_run')"
+                ))
+        except sqlite3.Error as e:
+            print(f"Price cache prewarm read failed: {e}")
+            return None
+        return int(state.get('runs', 0)), json.loads(state['last_run']) if 'last_run' in state else None
+
+    def get_prices(self, product_name, currency="Default", stores=None):
+        """
+        Drop-in replacement for get_food_prices that answers from the cache
+        and only falls through to the price history for the stores that missed.
+        """
+        stores = stores or USA_STORES
+        results = {}
+        missing = []
+        stale = []
+
+        self._sync_prewarm()
+        for store in stores:
+            key = self.make_key(product_name, store, currency)
+            status, value = self.lookup(key)
+            with self._lock:
+                if key in self._prewarmed:
+                    self._stats['prewarmed_lookups'] += 1
+                    self._prewarm_pending['prewarmed_lookups'] += 1
+                    if status != 'miss':
+                        self._stats['prewarmed_hits'] += 1
+                        self._prewarm_pending['prewarmed_hits'] += 1
+                if status == 'fresh':
+                    self._stats['hits'] += 1
+                elif status == 'stale':
+                    self._stats['stale_hits'] += 1
+                else:
+                    self._stats['misses'] += 1
+
+            if status == 'miss':
+                missing.append(store)
+            else:
+                results[store] = value
+                if status == 'stale':
+                    stale.append(store)
+
+        if stale:
+            self._refresh_in_background(product_name, currency, stale)
+
+        if missing:
+            results.update(self._fetch(product_name, currency, missing))
+        else:
+            product_index.touch(product_name)
+
+        return {store: results[store] for store in stores}
+
+    def stats(self):
+        """
+        This worker's counters. With a shared file, the prewarm figures are
+        the totals across every worker instead.
+        """
+        shared = None
+        if self.db_path:
+            self._sync_prewarm(force=True)
+            try:
+                with self._connect() as conn:
+                    shared = dict(conn.execute(
+                        "SELECT name, value FROM prewarm_state WHERE name IN ('prewarmed_lookups', 'prewarmed_hits')"
+                    ))
+            except sqlite3.Error as e:
+                print(f"Price cache prewarm read failed: {e}")
+
+        with self._lock:
+            stats = dict(self._stats)
+            stats['prewarmed_keys'] = len(self._prewarmed)
+        stats['size'] = len(self._entries)
+        stats['evictions'] = self._entries.stats()['evictions']
+        if shared is not None:
+            stats['prewarmed_lookups'] = int(shared.get('prewarmed_lookups', 0))
+            stats['prewarmed_hits'] = int(shared.get('prewarmed_hits', 0))
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['stale_hits']) / lookups, 4) if lookups else 0.0
+        stats['prewarmed_hit_rate'] = (round(stats['prewarmed_hits'] / stats['prewarmed_lookups'], 4)
+                                       if stats['prewarmed_lookups'] else 0.0)
+        stats['shared'] = bool(self.db_path)
+        return stats
+
+
+price_cache = PriceCache()
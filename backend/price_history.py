@@ -0,0 +1,294 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import config
+from scraper.scrapers import PriceResults, get_food_prices, USA_STORES
+
+PRICE_HISTORY_DB = config.get('PRICE_HISTORY_DB', os.path.join(os.path.dirname(__file__), 'price_history.db'))
+# How far back the first sync of a new query reaches.
+PRICE_HISTORY_DAYS = int(config.get('PRICE_HISTORY_DAYS', '30'))
+# A query synced more recently than this is answered without going upstream.
+PRICE_HISTORY_SYNC_INTERVAL = float(config.get('PRICE_HISTORY_SYNC_INTERVAL', '21600'))
+
+DATE_FORMAT = '%Y-%m-%d'
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+def _connect(db_path=None):
+    db_path = db_path or PRICE_HISTORY_DB
+    conn = sqlite3.connect(db_path, timeout=10)
+    conn.row_factory = sqlite3.Row
+
+    with _schema_lock:
+        if db_path not in _schema_ready:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS products (
+                    id INTEGER PRIMARY KEY,
+                    store TEXT NOT NULL,
+                    product_key TEXT NOT NULL,
+                    currency TEXT NOT NULL,
+                    meta TEXT NOT NULL,
+                    UNIQUE (store, product_key, currency)
+                );
+                CREATE TABLE IF NOT EXISTS price_points (
+                    product_id INTEGER NOT NULL REFERENCES products(id),
+                    date TEXT NOT NULL,
+                    price REAL NOT NULL,
+                    PRIMARY KEY (product_id, date)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS query_products (
+                    query TEXT NOT NULL,
+                    product_id INTEGER NOT NULL REFERENCES products(id),
+                    PRIMARY KEY (query, product_id)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    query TEXT NOT NULL,
+                    store TEXT NOT NULL,
+                    currency TEXT NOT NULL,
+                    last_date TEXT NOT NULL,
+                    synced_at REAL NOT NULL,
+                    PRIMARY KEY (query, store, currency)
+                ) WITHOUT ROWID;
+            ''')
+            _schema_ready.add(db_path)
+
+    return conn
+
+
+def normalize_product_name(name: str) -> str:
+    """ 'Organic  Eggs ' -> 'organic eggs' """
+    return re.sub(r'\s+', ' ', (name or '').strip().lower())
+
+
+def _today():
+    return datetime.now().strftime(DATE_FORMAT)
+
+
+def _days_ago(days):
+    return (datetime.now() - timedelta(days=days)).strftime(DATE_FORMAT)
+
+
+########### SYNC ############
+
+def _store_items(conn, query, store, currency, items):
+    """ Upserts one store's API payload. Returns the newest date seen. """
+    newest = None
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+
+        meta = {k: v for k, v in item.items() if k != 'Price over time'}
+        product_key = item.get('Product URL') or item.get('Product Name')
+        if not product_key:
+            continue
+
+        conn.execute(
+            'INSERT INTO products (store, product_key, currency, meta) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (store, product_key, currency) DO UPDATE SET meta = excluded.meta',
+            (store, product_key, currency, json.dumps(meta))
+        )
+        product_id = conn.execute(
+            'SELECT id FROM products WHERE store = ? AND product_key = ? AND currency = ?',
+            (store, product_key, currency)
+        ).fetchone()['id']
+        conn.execute(
+            'INSERT OR IGNORE INTO query_products (query, product_id) VALUES (?, ?)',
+            (query, product_id)
+        )
+
+        for point in item.get('Price over time') or []:
+            try:
+                date = str(point['Date'])[:10]
+                price = float(point['Price'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            conn.execute(
+                'INSERT OR REPLACE INTO price_points (product_id, date, price) VALUES (?, ?, ?)',
+                (product_id, date, price)
+            )
+            if newest is None or date > newest:
+                newest = date
+
+    return newest
+
+
+def sync_prices(product_name, currency="Default", stores=None, force=False):
+    """
+    Brings the local history for a query up to date. Only the dates from the
+    last stored point onwards are fetched from the price API. Returns the
+    stores whose fetch errored or timed out.
+    """
+    query = normalize_product_name(product_name)
+    stores = stores or USA_STORES
+    today = _today()
+    now = time.time()
+
+    with _connect() as conn:
+        state = {
+            row['store']: row for row in conn.execute(
+                'SELECT store, last_date, synced_at FROM sync_state WHERE query = ? AND currency = ?',
+                (query, currency)
+            )
+        }
+
+    # Group stores by the first date they still need, so each group is one fan-out.
+    pending = {}
+    for store in stores:
+        row = state.get(store)
+        if row is None:
+            start_date = _days_ago(PRICE_HISTORY_DAYS)
+        elif not force and now - row['synced_at'] < PRICE_HISTORY_SYNC_INTERVAL:
+            continue
+        else:
+            # Re-fetch the last stored day too, its price may have moved since.
+            # The API wants a non-empty range, so always reach back at least a day.
+            start_date = min(row['last_date'], _days_ago(1))
+        pending.setdefault(start_date, []).append(store)
+
+    failed = set()
+    for start_date, group in pending.items():
+        fetched = get_food_prices(product_name, currency, stores=group, start_date=start_date, end_date=today)
+        failed.update(getattr(fetched, 'failed', ()))
+
+        with _connect() as conn:
+            for store, items in fetched.items():
+                if not items:
+                    # Empty can mean an upstream error; leave the state so we retry.
+                    continue
+                items = items if isinstance(items, list) else [items]
+                newest = _store_items(conn, query, store, currency, items) or start_date
+                conn.execute(
+                    'INSERT OR REPLACE INTO sync_state (query, store, currency, last_date, synced_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (query, store, currency, newest, now)
+                )
+
+    return failed
+
+
+########### QUERIES ############
+
+def load_prices(product_name, currency="Default", stores=None, days=PRICE_HISTORY_DAYS):
+    """
+    Rebuilds the price API's {store: [item]} payload from the local store,
+    with each item's "Price over time" limited to the last `days` days.
+    """
+    query = normalize_product_name(product_name)
+    stores = stores or USA_STORES
+    since = _days_ago(days)
+    results = {store: [] for store in stores}
+
+    with _connect() as conn:
+        rows = conn.execute(
+            'SELECT p.id, p.store, p.meta, pp.date, pp.price '
+            'FROM query_products qp '
+            'JOIN products p ON p.id = qp.product_id '
+            'JOIN price_points pp ON pp.product_id = p.id '
+            'WHERE qp.query = ? AND p.currency = ? AND pp.date >= ? '
+            'ORDER BY p.id, pp.date',
+            (query, currency, since)
+        ).fetchall()
+
+    items = {}
+    for row in rows:
+        if row['store'] not in results:
+            continue
+        item = items.get(row['id'])
+        if item is None:
+            item = json.loads(row['meta'])
+            item['Price over time'] = []
+            items[row['id']] = item
+            results[row['store']].append(item)
+        item['Price over time'].append({'Date': row['date'], 'Price': row['price']})
+
+    return results
+
+
+def get_prices(product_name, currency="Default", stores=None):
+    """ Same contract as get_food_prices, answered from the local history. """
+    failed = sync_prices(product_name, currency, stores)
+    return PriceResults(load_prices(product_name, currency, stores), failed)
+
+
+def latest_price_records(results):
+    """
+    Flattens a {store: [item]} payload into the compact records the search
+    page renders: one per product, priced at its latest point.
+    """
+    records = []
+    for store_name, items in results.items():
+        items = items if isinstance(items, list) else [items]
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            history = item.get('Price over time')
+            if not history:
+                continue
+            try:
+                price = float(history[-1]['Price'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if price <= 0:
+                continue
+
+            records.append({
+                'storeName': item.get('Store') or store_name,
+                'productName': item.get('Product Name'),
+                'productUrl': item.get('Product URL'),
+                'location': item.get('Country') or 'Location N/A',
+                'price': price,
+                'inStock': True,
+            })
+    return records
+
+
+def get_price_trends(product_name, currency="Default", days=30, store=None):
+    """
+    Returns min / avg / max / latest price per product over the last `days` days.
+    """
+    query = normalize_product_name(product_name)
+    since = _days_ago(days)
+
+    sql = (
+        'SELECT p.id, p.store, p.meta, MIN(pp.price) AS min_price, AVG(pp.price) AS avg_price, '
+        'MAX(pp.price) AS max_price, COUNT(*) AS points, MAX(pp.date) AS latest_date '
+        'FROM query_products qp '
+        'JOIN products p ON p.id = qp.product_id '
+        'JOIN price_points pp ON pp.product_id = p.id '
+        'WHERE qp.query = ? AND p.currency = ? AND pp.date >= ?'
+    )
+    params = [query, currency, since]
+    if store:
+        sql += ' AND p.store = ?'
+        params.append(store)
+    sql += ' GROUP BY p.id ORDER BY avg_price'
+
+    trends = []
+    with _connect() as conn:
+        for row in conn.execute(sql, params).fetchall():
+            latest = conn.execute(
+                'SELECT price FROM price_points WHERE product_id = ? AND date = ?',
+                (row['id'], row['latest_date'])
+            ).fetchone()
+            meta = json.loads(row['meta'])
+            trends.append({
+                'store': meta.get('Store') or row['store'],
+                'productName': meta.get('Product Name'),
+                'productUrl': meta.get('Product URL'),
+                'min': row['min_price'],
+                'avg': round(row['avg_price'], 2),
+                'max': row['max_price'],
+                'latest': latest['price'] if latest else None,
+                'latestDate': row['latest_date'],
+                'points': row['points'],
+            })
+
+    return trends
@@ -0,0 +1,177 @@
+import fcntl
+import sys
+import threading
+import time
+from collections import Counter
+
+import config
+from firebase_setup import db
+from price_cache import price_cache
+from price_history import normalize_product_name
+from product_index import product_index
+from scraper.scrapers import USA_STORES
+
+# Seconds between prewarm runs inside the web server; 0 (the default) leaves
+# prewarming to `python price_prewarm.py run` on a cron. Either way it needs a
+# shared PRICE_CACHE_DB, or each worker would fill only its own cache.
+PRICE_PREWARM_INTERVAL = float(config.get('PRICE_PREWARM_INTERVAL', '0'))
+# Delay before the first run so it doesn't compete with startup traffic.
+PRICE_PREWARM_DELAY = float(config.get('PRICE_PREWARM_DELAY', '30'))
+# Most frequent list item names refreshed per run.
+PRICE_PREWARM_BUDGET = int(config.get('PRICE_PREWARM_BUDGET', '50'))
+
+_state = {'runs': 0, 'last_run': None, 'leader': False}
+_state_lock = threading.Lock()
+_thread = None
+_start_lock = threading.Lock()
+
+
+def popular_item_names(limit=PRICE_PREWARM_BUDGET):
+    """
+    Counts every shopping list item by normalized name. Returns the `limit`
+    most common as [(name, count)], the items scanned and the distinct names.
+    """
+    counts = Counter()
+    for item in db.collection_group('items').select(['name']).stream():
+        list_ref = item.reference.parent.parent
+        if list_ref is None or list_ref.parent.id != 'lists':
+            continue
+        # Not item.get('name'): a snapshot raises KeyError for a missing field
+        name = normalize_product_name((item.to_dict() or {}).get('name'))
+        if name:
+            counts[name] += 1
+    return counts.most_common(limit), sum(counts.values()), len(counts)
+
+
+def prewarm(budget=PRICE_PREWARM_BUDGET):
+    """
+    Refreshes cached prices for the most common list items, then the most
+    searched queries if there's budget left. Returns a run summary.
+    """
+    started = time.time()
+    names, items_scanned, unique_names = popular_item_names(budget)
+    # Spare budget goes to the most searched queries the typeahead has seen
+    listed = {name for name, _ in names}
+    for query in product_index.popular_queries(budget):
+        if len(names) >= budget:
+            break
+        if query not in listed:
+            names.append((query, 0))
+
+    refreshed = already_warm = failed = 0
+    for name, _ in names:
+        try:
+            if price_cache.warm(name):
+                refreshed += 1
+            else:
+                already_warm += 1
+        except Exception as e:
+            failed += 1
+            print(f"Prewarm failed for '{name}': {e}")
+
+    price_cache.forget_prewarmed({
+        price_cache.make_key(name, store) for name, _ in names for store in USA_STORES
+    })
+
+    summary = {
+        'startedAt': started,
+        'durationSeconds': round(time.time() - started, 3),
+        'itemsScanned': items_scanned,
+        'uniqueNames': unique_names,
+        'names': len(names),
+        'refreshed': refreshed,
+        'alreadyWarm': already_warm,
+        'failed': failed,
+    }
+    with _state_lock:
+        _state['runs'] += 1
+        _state['last_run'] = summary
+    price_cache.record_prewarm_run(summary)
+    print(f"Prewarmed prices for {refreshed} of {len(names)} popular items "
+          f"({already_warm} already warm, {failed} failed) in {summary['durationSeconds']}s")
+    return summary
+
+
+def _acquire_leader_lock():
+    """
+    Takes an exclusive lock next to the shared cache file, so only one
+    gunicorn worker on the host runs the job. Returns the open lock file, or
+    None if another worker holds it.
+    """
+    lock_file = open(f"{price_cache.db_path}.prewarm.lock", 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def _run():
+    time.sleep(PRICE_PREWARM_DELAY)
+    # Followers keep checking, so another worker takes over if the leader exits
+    lock_file = _acquire_leader_lock()
+    while lock_file is None:
+        time.sleep(PRICE_PREWARM_INTERVAL)
+        lock_file = _acquire_leader_lock()
+    with _state_lock:
+        _state['leader'] = True
+
+    while True:
+        try:
+            prewarm()
+        except Exception as e:
+            print(f"Price prewarm run failed: {repr(e)}")
+        time.sleep(PRICE_PREWARM_INTERVAL)
+
+
+def start():
+    """
+    Starts the background job once per process when PRICE_PREWARM_INTERVAL
+    is set. Only the worker holding the leader lock actually runs it.
+    """
+    global _thread
+    if PRICE_PREWARM_INTERVAL <= 0:
+        return
+    if not price_cache.db_path:
+        print("PRICE_PREWARM_INTERVAL is set but PRICE_CACHE_DB isn't; not prewarming a per-worker cache")
+        return
+    with _start_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_run, name='price-prewarm', daemon=True)
+            _thread.start()
+
+
+def stats():
+    """
+    The last run, plus how often lookups for prewarmed items were served from
+    cache. With PRICE_CACHE_DB these come from the shared file, so every
+    worker reports the cron job's or the leader's runs and everyone's hits.
+    """
+    cache = price_cache.stats()
+    shared = price_cache.prewarm_runs()
+    with _state_lock:
+        runs, last_run = shared if shared is not None else (_state['runs'], _state['last_run'])
+        return {
+            'enabled': PRICE_PREWARM_INTERVAL > 0 and bool(price_cache.db_path),
+            'leader': _state['leader'],
+            'intervalSeconds': PRICE_PREWARM_INTERVAL,
+            'budget': PRICE_PREWARM_BUDGET,
+            'runs': runs,
+            'lastRun': dict(last_run) if last_run else None,
+            'prewarmedKeys': cache['prewarmed_keys'],
+            'prewarmedLookups': cache['prewarmed_lookups'],
+            'prewarmedHitRate': cache['prewarmed_hit_rate'],
+            'overallHitRate': cache['hit_rate'],
+        }
+
+
+if __name__ == "__main__":
+    # Cron / one-off: python price_prewarm.py run [budget]
+    if len(sys.argv) > 1 and sys.argv[1] == 'run':
+        if not price_cache.db_path:
+            # Without the shared cache, what this process fetched would die with it
+            sys.exit("PRICE_CACHE_DB must point at the web workers' shared price cache")
+        prewarm(int(sys.argv[2]) if len(sys.argv) > 2 else PRICE_PREWARM_BUDGET)
+    else:
+        print("Usage: python price_prewarm.py run [budget]")
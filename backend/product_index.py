@@ -0,0 +1,197 @@
+import atexit
+import bisect
+import json
+import os
+import re
+import threading
+import time
+
+import config
+from price_history import normalize_product_name
+
+# Names kept in the index; the least used tenth is dropped when it overflows.
+PRODUCT_INDEX_MAX_NAMES = int(config.get('PRODUCT_INDEX_MAX_NAMES', '20000'))
+# JSON snapshot reloaded on startup; empty disables persistence.
+PRODUCT_INDEX_SNAPSHOT = config.get('PRODUCT_INDEX_SNAPSHOT', os.path.join(os.path.dirname(__file__), 'product_index.json'))
+PRODUCT_INDEX_SNAPSHOT_INTERVAL = float(config.get('PRODUCT_INDEX_SNAPSHOT_INTERVAL', '300'))
+# Index keys scanned per lookup, so a one-letter prefix stays cheap.
+MAX_PREFIX_SCAN = 500
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def normalize(text):
+    """ 'Eggs, Large (12ct)' -> 'eggs large 12ct' """
+    return normalize_product_name(_PUNCTUATION.sub(' ', text or ''))
+
+
+class ProductIndex:
+    """
+    Prefix index over every product name and successful query the price API
+    has returned. Each name is filed under the suffix starting at every word,
+    so "mi" and "whole mi" both find "Organic Whole Milk". Lookups are a
+    bisect into a sorted array.
+    """
+
+    def __init__(self, max_names=PRODUCT_INDEX_MAX_NAMES):
+        self.max_names = max_names
+        self._names = {}  # normalized -> [display, is_query, hits, last_seen]
+        self._keys = []   # sorted (suffix, normalized)
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    @staticmethod
+    def _suffixes(name):
+        words = name.split(' ')
+        return {' '.join(words[i:]) for i in range(len(words))}
+
+    def _add(self, display, is_query, now):
+        name = normalize(display)
+        if not name:
+            return
+        entry = self._names.get(name)
+        if entry is None:
+            self._names[name] = [display.strip(), is_query, 1, now]
+            for suffix in self._suffixes(name):
+                bisect.insort(self._keys, (suffix, name))
+        else:
+            entry[1] = entry[1] or is_query
+            entry[2] += 1
+            entry[3] = now
+            if is_query:
+                entry[0] = display.strip()
+
+    def _evict(self):
+        if len(self._names) <= self.max_names:
+            return
+        by_use = sorted(self._names, key=lambda n: (self._names[n][2], self._names[n][3]))
+        for name in by_use[:len(self._names) - int(self.max_names * 0.9)]:
+            del self._names[name]
+        self._keys = [k for k in self._keys if k[1] in self._names]
+
+    def add_results(self, query, results):
+        """ Indexes a price lookup: the query itself if anything came back, and every product name. """
+        products = []
+        for items in (results or {}).values():
+            for item in (items if isinstance(items, list) else [items]):
+                if isinstance(item, dict) and item.get('Product Name'):
+                    products.append(item['Product Name'])
+        if not products:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._add(normalize_product_name(query), True, now)
+            for product in set(products):
+                self._add(product, False, now)
+            self._evict()
+            self._dirty = True
+
+    def touch(self, query):
+        """ Counts a search answered from cache towards the query's popularity. """
+        name = normalize(query)
+        with self._lock:
+            entry = self._names.get(name)
+            if entry is not None and entry[1]:
+                entry[2] += 1
+                entry[3] = time.time()
+                self._dirty = True
+
+    def suggest(self, prefix, limit=8):
+        """ Up to `limit` names matching `prefix`: known-good queries first, then by hits. """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            start = bisect.bisect_left(self._keys, (prefix,))
+            matches = set()
+            for suffix, name in self._keys[start:start + MAX_PREFIX_SCAN]:
+                if not suffix.startswith(prefix):
+                    break
+                matches.add(name)
+            entries = [(name, self._names[name]) for name in matches]
+
+        entries.sort(key=lambda e: (not e[1][1], not e[0].startswith(prefix), -e[1][2], len(e[0])))
+        return [
+            {'text': entry[0], 'type': 'query' if entry[1] else 'product', 'hits': entry[2]}
+            for _, entry in entries[:limit]
+        ]
+
+    def popular_queries(self, limit):
+        """ The most searched queries that returned results, for warming the price cache. """
+        with self._lock:
+            queries = [(name, e[2]) for name, e in self._names.items() if e[1]]
+        queries.sort(key=lambda q: -q[1])
+        return [name for name, _ in queries[:limit]]
+
+    # --- Snapshots ---
+
+    def save(self, path=PRODUCT_INDEX_SNAPSHOT):
+        if not path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            rows = [[name] + entry for name, entry in self._names.items()]
+            self._dirty = False
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': 1, 'names': rows}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Product index snapshot failed: {e}")
+            with self._lock:
+                self._dirty = True
+
+    def load(self, path=PRODUCT_INDEX_SNAPSHOT):
+        if not path or not os.path.exists(path):
+            return
+        try:
+            with open(path) as f:
+                rows = json.load(f)['names']
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable product index snapshot {path}: {e}")
+            return
+
+        names = {row[0]: list(row[1:]) for row in rows}
+        keys = sorted((suffix, name) for name in names for suffix in self._suffixes(name))
+        with self._lock:
+            self._names = names
+            self._keys = keys
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'names': len(self._names),
+                'queries': sum(1 for e in self._names.values() if e[1]),
+                'keys': len(self._keys),
+                'maxNames': self.max_names,
+                'snapshot': PRODUCT_INDEX_SNAPSHOT or None,
+            }
+
+
+product_index = ProductIndex()
+product_index.load()
+
+_snapshot_thread = None
+_snapshot_lock = threading.Lock()
+
+
+def _snapshot_loop():
+    while True:
+        time.sleep(PRODUCT_INDEX_SNAPSHOT_INTERVAL)
+        product_index.save()
+
+
+def start_snapshots():
+    """ Saves the index every PRODUCT_INDEX_SNAPSHOT_INTERVAL seconds and at exit. """
+    global _snapshot_thread
+    if not PRODUCT_INDEX_SNAPSHOT:
+        return
+    with _snapshot_lock:
+        if _snapshot_thread is None:
+            _snapshot_thread = threading.Thread(target=_snapshot_loop, name='product-index-snapshot', daemon=True)
+            _snapshot_thread.start()
+            atexit.register(product_index.save)
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import math
+import re
+from collections import Counter
+
+import config
+from ttl_cache import TTLCache
+
+# Below this share of confidently-decided products, the caller should ask Gemini instead.
+RANK_CONFIDENCE_THRESHOLD = float(config.get('RANK_CONFIDENCE_THRESHOLD', '0.75'))
+
+RANKING_CACHE_TTL = float(config.get('RANKING_CACHE_TTL', '86400'))
+RANKING_CACHE_MAX_ENTRIES = int(config.get('RANKING_CACHE_MAX_ENTRIES', '2048'))
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Words that trail a product name without being what the product *is*:
+# sizes, units, grades and packaging. Skipped when looking for the head noun.
+TRAILING_DESCRIPTORS = {
+    'oz', 'fl', 'lb', 'lbs', 'g', 'kg', 'ml', 'l', 'ct', 'count', 'pack', 'pk', 'gal', 'gallon',
+    'quart', 'qt', 'pint', 'pt', 'dozen', 'doz', 'each', 'ea', 'bag', 'box', 'jar', 'can', 'bottle',
+    'carton', 'package', 'pkg', 'bunch', 'size', 'family', 'value', 'bulk', 'half',
+    'large', 'medium', 'small', 'jumbo', 'extra', 'xl', 'mini', 'grade', 'a', 'aa', 'aaa',
+    'brown', 'white', 'red', 'green', 'yellow', 'organic', 'fresh', 'frozen', 'raw', 'whole',
+    'sliced', 'diced', 'shredded', 'unsalted', 'salted', 'boneless', 'skinless', 'natural',
+    'original', 'classic', 'plain', 'reduced', 'fat', 'free', 'low', 'nonfat', 'lowfat',
+    'and', 'with', 'of', 'the', 'in', 'by', 'for',
+}
+
+
+def _stem(token: str) -> str:
+    """ Just enough plural folding for product names: eggs -> egg, berries -> berry. """
+    if len(token) <= 3:
+        return token
+    if token.endswith('ies'):
+        return token[:-3] + 'y'
+    if token.endswith('oes'):
+        return token[:-2]
+    if token.endswith('sses') or token.endswith('shes') or token.endswith('ches'):
+        return token[:-2]
+    if token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list:
+    return [_stem(t) for t in re.findall(r"[a-z0-9%]+", (text or '').lower().replace("'", ''))]
+
+
+def _is_descriptor(token: str) -> bool:
+    return token in TRAILING_DESCRIPTORS or re.fullmatch(r'[0-9%]+', token) is not None
+
+
+def head_noun(tokens: list):
+    """ The last token that isn't a number, unit or descriptor ("Milk Chocolate 3.5 oz" -> chocolate). """
+    for token in reversed(tokens):
+        if _is_descriptor(token):
+            continue
+        return token
+    return tokens[-1] if tokens else None
+
+
+def bm25_scores(query_tokens: list, documents: list) -> list:
+    """ BM25 of the query against each tokenized document, with IDF taken over `documents`. """
+    n = len(documents)
+    if n == 0:
+        return []
+
+    avg_len = sum(len(d) for d in documents) / n or 1
+    doc_freq = Counter()
+    for doc in documents:
+        doc_freq.update(set(doc))
+
+    scores = []
+    for doc in documents:
+        tf = Counter(doc)
+        score = 0.0
+        for term in set(query_tokens):
+            if term not in tf:
+                continue
+            idf = math.log(1 + (n - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+            norm = tf[term] * (BM25_K1 + 1) / (tf[term] + BM25_K1 * (1 - BM25_B + BM25_B * len(doc) / avg_len))
+            score += idf * norm
+        scores.append(score)
+    return scores
+
+
+def rank_locally(query: str, results_list: list):
+    """
+    Filters and sorts product results without calling an LLM.
+
+    A product is kept when its head noun is the query's head noun ("Chocolate
+    Milk" for "milk") and dropped when none of the query terms appear, or the
+    query only shows up as a modifier ("Milk Chocolate"). A kept product only
+    counts as decided when every other word in its name is a size, unit or
+    descriptor; words we can't explain ("Cadbury Creme Egg") lower its score
+    and leave the call to Gemini. Returns (ranked_results, confidence), where
+    confidence is the share of products one of those rules decided outright.
+    """
+    query_tokens = tokenize(query)
+    if not query_tokens:
+        return results_list, 0.0
+
+    query_head = head_noun(query_tokens)
+    query_terms = set(query_tokens)
+
+    candidates = [r for r in results_list if r.get('productName')]
+    if not candidates:
+        return results_list, 1.0
+
+    documents = [tokenize(r['productName']) for r in candidates]
+    scores = bm25_scores(query_tokens, documents)
+
+    kept = []
+    confident = 0
+    for result, tokens, score in zip(candidates, documents, scores):
+        terms = set(tokens)
+        matched = query_terms & terms
+        if not matched:
+            confident += 1
+            continue
+
+        product_head = head_noun(tokens)
+        if product_head == query_head or product_head in query_terms:
+            unexplained = sum(1 for t in terms - query_terms if not _is_descriptor(t))
+            if matched == query_terms and not unexplained:
+                confident += 1
+            kept.append((score / (1 + unexplained), len(tokens), result))
+        elif query_head in terms and tokens.index(query_head) < tokens.index(product_head):
+            # The query is describing something else, e.g. "milk" in "Milk Chocolate".
+            confident += 1
+        else:
+            # Partial or unusual match; keep it, but it lowers our confidence.
+            kept.append((score * 0.5, len(tokens), result))
+
+    kept.sort(key=lambda k: (-k[0], k[1]))
+    return [k[2] for k in kept], confident / len(candidates)
+
+
+def apply_order(results_list: list, ordered_names: list) -> list:
+    """ Keeps only results named in `ordered_names`, in that order. """
+    sort_order = {name: index for index, name in enumerate(ordered_names)}
+    sorted_results = sorted(results_list, key=lambda r: sort_order.get(r.get('productName'), 999))
+    return [r for r in sorted_results if r.get('productName') in sort_order]
+
+
+def product_set_fingerprint(product_names: list) -> str:
+    """ Stable hash of the distinct product names, independent of their order. """
+    payload = json.dumps(sorted(set(product_names)))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class RankingCache:
+    """
+    LRU cache of ranked product-name lists, keyed on the normalized query plus
+    a fingerprint of the product set, so an expensive ranking runs once per
+    distinct (query, catalog) pair.
+    """
+
+    def __init__(self, max_entries=RANKING_CACHE_MAX_ENTRIES, ttl=RANKING_CACHE_TTL):
+        self._cache = TTLCache(max_entries, ttl)
+
+    @staticmethod
+    def make_key(query, product_names):
+        return f"{' '.join(tokenize(query))}|{product_set_fingerprint(product_names)}"
+
+    def get(self, query, product_names):
+        ordered_names = self._cache.get(self.make_key(query, product_names))
+        return list(ordered_names) if ordered_names is not None else None
+
+    def set(self, query, product_names, ordered_names):
+        self._cache.set(self.make_key(query, product_names), list(ordered_names))
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+ranking_cache = RankingCache()
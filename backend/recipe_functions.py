@@ -1,50 +1,175 @@
-import google.generativeai as genai
-from firebase_admin import firestore
-from dotenv import load_dotenv
-import os
 import ast
+import json
 import re
 
-from firebase_setup import db
+from firebase_setup import db, firestore
+from doc_cache import doc_cache, recipe_key
+from gemini_client import generate_text, stream_text
+import ranker
+import recipe_index
 
-load_dotenv()
-GEMINI_API_KEY = os.getenv('API_KEY')
+# Keys in this order so a streaming client gets name and ingredients before the long instructions.
+RECIPE_FORMAT = '{"name": string, "ingredients": [{"name": string, "amount": string}], "instructions": string}'
+REQUIRED_RECIPE_FIELDS = ('name', 'ingredients', 'instructions')
 
 ########### GET FROM GEMINI ############
 
+def _random_recipe_prompt():
+    return f'Give me a recipe as JSON in the format: {RECIPE_FORMAT}.'
+
+def _ingredient_recipe_prompt(ingredients_list: list):
+    ingredient_str = ", ".join(ingredients_list)
+    return f'Give me a recipe that includes {ingredient_str}, as JSON in the format: {RECIPE_FORMAT}.'
+
 def get_random_recipe():
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    recipe = model.generate_content('Give me a recipe in the format: {name: name of recipe, ingredients: {name, amount}, {name, amount}, instructions: string of instructions}. Do not include "```json```"')
+    # Not coalesced: concurrent callers should each get a different recipe
+    recipe = generate_text(_random_recipe_prompt(), coalesce=False, json_output=True)
 
-    return recipe.text
+    return recipe
 
 def get_ingredient_recipe(ingredients_list: list):
-    ingredient_str = ", ".join(ingredients_list) 
-
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    recipe = model.generate_content(f'Give me a recipe that includes {ingredient_str}...')
-    return recipe.text
+    recipe = generate_text(_ingredient_recipe_prompt(ingredients_list), json_output=True)
+    return recipe
 
 def get_specific_recipe(food):
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    recipe = model.generate_content(f'Give me a recipe of {food} in the format: {{name: {food}, ingredients: {{name, amount}}, {{name, amount}}, instructions: string of instructions}}". Do not include "```json```"')
+    recipe = generate_text(f'Give me a recipe of {food} as JSON in the format: {RECIPE_FORMAT}, with "name" set to "{food}".', json_output=True)
+
+    return recipe
+
+def parse_recipe(recipe_str: str) -> dict:
+    """ Parses a generated recipe; JSON first, Python-literal text as a fallback. """
+    try:
+        return json.loads(recipe_str)
+    except ValueError:
+        return ast.literal_eval(recipe_str)
+
+########### STREAMING ############
+
+class RecipeStreamParser:
+    """
+    Incremental parser for a streamed JSON object. feed() takes the next chunk
+    of text and returns the (key, value) pairs whose values just became complete.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        self.started = False
+        self.closed = False
+        self.fields = {}
+        self._decoder = json.JSONDecoder()
+
+    def _skip(self, chars):
+        while self.pos < len(self.buffer) and self.buffer[self.pos] in chars:
+            self.pos += 1
+
+    def feed(self, chunk: str) -> list:
+        self.buffer += chunk
+        completed = []
+        if self.closed:
+            return completed
+
+        if not self.started:
+            self._skip(' \t\r\n')
+            if self.pos >= len(self.buffer):
+                return completed
+            if self.buffer[self.pos] != '{':
+                raise ValueError("Recipe stream is not a JSON object")
+            self.pos += 1
+            self.started = True
+
+        while True:
+            start = self.pos
+            self._skip(' \t\r\n,')
+            if self.buffer[self.pos:self.pos + 1] == '}':
+                self.pos += 1
+                self.closed = True
+                return completed
+            try:
+                key, end = self._decoder.raw_decode(self.buffer, self.pos)
+                self.pos = end
+                self._skip(' \t\r\n')
+                if self.pos >= len(self.buffer):
+                    raise ValueError("incomplete")
+                if self.buffer[self.pos] != ':':
+                    raise ValueError("Expected ':' after recipe key")
+                self.pos += 1
+                self._skip(' \t\r\n')
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+                if not isinstance(value, (str, list, dict)) and not self.buffer[end:].strip():
+                    # A number cut off by the chunk boundary ("4" of "40") decodes fine;
+                    # wait until something follows it.
+                    raise ValueError("incomplete")
+            except ValueError:
+                # The next key or value hasn't fully arrived yet
+                self.pos = start
+                return completed
+
+            self.pos = end
+            self.fields[key] = value
+            completed.append((key, value))
+
+    def finish(self) -> dict:
+        """
+        Called once the stream ends. feed() can't tell a value that hasn't
+        arrived yet from a malformed one, so a truncated or broken stream is
+        only caught here. Returns the recipe or raises ValueError.
+        """
+        if not self.closed or self.buffer[self.pos:].strip():
+            raise ValueError("Recipe stream ended before the JSON object was complete")
+        missing = [f for f in REQUIRED_RECIPE_FIELDS if f not in self.fields]
+        if missing:
+            raise ValueError(f"Recipe stream is missing {', '.join(missing)}")
+        return self.fields
+
+def stream_recipe(prompt: str):
+    """ Yields (field, value) as each recipe field finishes streaming, then ('done', recipe). """
+    parser = RecipeStreamParser()
+    for chunk in stream_text(prompt, json_output=True):
+        for field in parser.feed(chunk):
+            yield field
+    yield 'done', parser.finish()
+
+def stream_random_recipe():
+    return stream_recipe(_random_recipe_prompt())
+
+def stream_ingredient_recipe(ingredients_list: list):
+    return stream_recipe(_ingredient_recipe_prompt(ingredients_list))
+
+def rank_products(query: str, results_list: list):
+    """
+    FILTERS and ranks product results for a query.
+    Tries the local lexical ranker first and only asks Gemini when it isn't
+    confident. Returns (ranked_list, path) where path is 'local', 'gemini'
+    or 'local-fallback' (Gemini was needed but failed).
+    """
+    local_results, confidence = ranker.rank_locally(query, results_list)
+    if confidence >= ranker.RANK_CONFIDENCE_THRESHOLD:
+        return local_results, 'local'
 
-    return recipe.text
+    try:
+        return gemini_rank_products(query, results_list), 'gemini'
+    except Exception as e:
+        print(f"!!! GEMINI RANKING FAILED, USING LOCAL RANKING: {e}")
+        return local_results, 'local-fallback'
 
 def filter_and_rank_products(query: str, results_list: list):
+    ranked, _ = rank_products(query, results_list)
+    return ranked
+
+def gemini_rank_products(query: str, results_list: list):
     """
     Uses Gemini to FILTER and rank a list of product results based on a query.
+    Rankings are memoized per (query, set of product names).
     """
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel('gemini-2.5-flash')
-
     product_names = [r.get('productName') for r in results_list if r.get('productName')]
     if not product_names:
         return results_list # No names to rank
 
+    cached_names = ranker.ranking_cache.get(query, product_names)
+    if cached_names is not None:
+        return ranker.apply_order(results_list, cached_names)
+
     # 1. This is the new, stricter prompt.
     prompt = (
         f"You are a smart grocery shopping assistant. A user searched for the item: '{query}'.\n"
@@ -57,8 +182,7 @@ def filter_and_rank_products(query: str, results_list: list):
         "Finally, return *only* the filtered and sorted Python list. If no items are relevant, return an empty list []."
     )
 
-    response = model.generate_content(prompt)
-    gemini_response_text = response.text.strip()
+    gemini_response_text = generate_text(prompt).strip()
     
     print("--- Gemini AI Filter/Rank Response ---")
     print(gemini_response_text)
@@ -78,23 +202,16 @@ def filter_and_rank_products(query: str, results_list: list):
         # If Gemini fails, just return the original list
         return results_list 
 
-    sort_order = {name: index for index, name in enumerate(sorted_names_list)}
-
-    sorted_results = sorted(
-        results_list,
-        key=lambda r: sort_order.get(r.get('productName'), 999)
-    )
-
-    final_filtered_list = [r for r in sorted_results if r.get('productName') in sort_order]
-
-    return final_filtered_list
+    ranker.ranking_cache.set(query, product_names, sorted_names_list)
+    return ranker.apply_order(results_list, sorted_names_list)
 
 ########## ADD FUNCTIONS ##############
 
 def add_recipe(user_id: str, recipe_str: str):
-    recipe_data = ast.literal_eval(recipe_str)
+    recipe_data = parse_recipe(recipe_str)
     recipe_data['ownerId'] = user_id
     recipe_data['createdAt'] = firestore.SERVER_TIMESTAMP
+    recipe_index.with_index_fields(recipe_data)
     doc_ref = db.collection('recipes').add(recipe_data)
     return doc_ref[1].id
     
@@ -102,12 +219,14 @@ def add_recipe(user_id: str, recipe_str: str):
 
 def update_recipe(recipe_id: str, new_data: dict):
     doc_ref = db.collection('recipes').document(recipe_id)
-    doc_ref.update(new_data)
+    doc_ref.update(recipe_index.with_index_fields(dict(new_data)))
+    doc_cache.invalidate(recipe_key(recipe_id))
 
 ######## DELETING FUNCTIONS ############
 def delete_recipe(recipe_id: str):
     doc_ref = db.collection('recipes').document(recipe_id)
     doc_ref.delete()
+    doc_cache.invalidate(recipe_key(recipe_id))
 
 
 if __name__ == "__main__":
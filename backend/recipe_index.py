@@ -0,0 +1,126 @@
+import sys
+
+from firebase_setup import db
+from ranker import head_noun, tokenize
+
+# Firestore caps array_contains_any at 30 values per query.
+ARRAY_CONTAINS_ANY_LIMIT = 30
+MAX_BATCH_WRITES = 500
+
+
+def ingredient_terms(name):
+    """
+    The index terms for one ingredient or list item: its full normalized
+    name and its head noun, so "Large Eggs" and "eggs" meet at "egg".
+    Returns (full, head), or None for an empty name.
+    """
+    tokens = tokenize(name)
+    if not tokens:
+        return None
+    return ' '.join(tokens), head_noun(tokens)
+
+
+def ingredient_keys(ingredients):
+    """ The `ingredientKeys` array stored on a recipe document. """
+    keys = set()
+    for ingredient in ingredients or []:
+        name = ingredient.get('name') if isinstance(ingredient, dict) else ingredient
+        terms = ingredient_terms(name)
+        if terms:
+            keys.update(terms)
+    return sorted(keys)
+
+
+def with_index_fields(data):
+    """ Adds `ingredientKeys` to a recipe create or update payload that sets ingredients. """
+    if 'ingredients' in data:
+        data['ingredientKeys'] = ingredient_keys(data['ingredients'])
+    return data
+
+
+def _user_recipes(user_id, keys):
+    """ The user's recipes whose ingredientKeys share at least one of `keys`. """
+    keys = sorted(set(keys))
+    recipes = {}
+    for i in range(0, len(keys), ARRAY_CONTAINS_ANY_LIMIT):
+        query = db.collection('recipes') \
+                  .where('ownerId', '==', user_id) \
+                  .where('ingredientKeys', 'array_contains_any', keys[i:i + ARRAY_CONTAINS_ANY_LIMIT])
+        for doc in query.stream():
+            recipes[doc.id] = doc
+    return list(recipes.values())
+
+
+def _matches(ingredient, fulls, heads):
+    terms = ingredient_terms(ingredient.get('name') if isinstance(ingredient, dict) else ingredient)
+    return terms is not None and (terms[0] in fulls or terms[1] in heads)
+
+
+def find_by_ingredients(user_id, ingredients):
+    """ The user's recipes that use every one of `ingredients`, as documents. """
+    wanted = [t for t in (ingredient_terms(name) for name in ingredients) if t]
+    if not wanted:
+        return []
+
+    # Firestore narrows to recipes sharing the first ingredient; the rest are checked here
+    docs = _user_recipes(user_id, [wanted[0][0], wanted[0][1]])
+    found = []
+    for doc in docs:
+        recipe_ingredients = doc.to_dict().get('ingredients') or []
+        if all(any(_matches(ing, {full}, {head}) for ing in recipe_ingredients) for full, head in wanted):
+            found.append(doc)
+    return found
+
+
+def rank_by_shopping_list(user_id, item_names, limit=20):
+    """
+    Ranks the user's recipes by how many of their ingredients are on the
+    shopping list. Returns [(doc, matched_names, missing_names)], best first:
+    most ingredients covered, then the smallest share left to buy.
+    """
+    terms = [t for t in (ingredient_terms(name) for name in item_names) if t]
+    if not terms:
+        return []
+    fulls = {full for full, _ in terms}
+    heads = {head for _, head in terms}
+
+    ranked = []
+    for doc in _user_recipes(user_id, fulls | heads):
+        matched, missing = [], []
+        for ingredient in doc.to_dict().get('ingredients') or []:
+            name = ingredient.get('name') if isinstance(ingredient, dict) else ingredient
+            (matched if _matches(ingredient, fulls, heads) else missing).append(name)
+        if matched:
+            ranked.append((doc, matched, missing))
+
+    ranked.sort(key=lambda r: (-len(r[1]), len(r[2]) / (len(r[1]) + len(r[2]))))
+    return ranked[:limit]
+
+
+def backfill():
+    """ Writes ingredientKeys on every recipe that predates the index. Returns the number updated. """
+    batch = db.batch()
+    pending = updated = 0
+    for doc in db.collection('recipes').select(['ingredients', 'ingredientKeys']).stream():
+        data = doc.to_dict()
+        keys = ingredient_keys(data.get('ingredients'))
+        if data.get('ingredientKeys') == keys:
+            continue
+        batch.update(doc.reference, {'ingredientKeys': keys})
+        pending += 1
+        if pending == MAX_BATCH_WRITES:
+            batch.commit()
+            updated += pending
+            batch, pending = db.batch(), 0
+    if pending:
+        batch.commit()
+        updated += pending
+    return updated
+
+
+if __name__ == "__main__":
+    # Maintenance: python recipe_index.py backfill
+    if len(sys.argv) > 1 and sys.argv[1] == 'backfill':
+        print(f"Indexed ingredients of {backfill()} recipes")
+    else:
+        print("Usage: python recipe_index.py backfill")
@@ -0,0 +1,70 @@
+import queue
+import threading
+import time
+
+import config
+import recipe_functions
+
+# The worker refills up to the high watermark whenever the pool drops to the low one.
+RECIPE_POOL_HIGH = int(config.get('RECIPE_POOL_HIGH', '10'))
+RECIPE_POOL_LOW = int(config.get('RECIPE_POOL_LOW', '3'))
+RECIPE_POOL_RETRY_DELAY = 5
+
+
+class RecipePool:
+    """
+    Bounded queue of pre-generated, pre-parsed recipes kept topped up by a
+    background thread. pop() never waits on Gemini: it returns None when the
+    pool is empty and the caller generates live instead.
+    """
+
+    def __init__(self, name, generate, high=RECIPE_POOL_HIGH, low=RECIPE_POOL_LOW):
+        self.name = name
+        self.generate = generate
+        self.high = high
+        self.low = low
+        self._recipes = queue.Queue(maxsize=high)
+        self._wake = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f'recipe-pool-{self.name}', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+
+            while not self._recipes.full():
+                try:
+                    recipe = recipe_functions.parse_recipe(self.generate())
+                except Exception as e:
+                    print(f"Recipe pool '{self.name}' failed to generate: {e}")
+                    time.sleep(RECIPE_POOL_RETRY_DELAY)
+                    continue
+                try:
+                    self._recipes.put_nowait(recipe)
+                except queue.Full:
+                    break
+
+    def pop(self):
+        self.start()
+        try:
+            recipe = self._recipes.get_nowait()
+        except queue.Empty:
+            return None
+        finally:
+            if self._recipes.qsize() <= self.low:
+                self._wake.set()
+        return recipe
+
+    def size(self):
+        return self._recipes.qsize()
+
+
+random_recipes = RecipePool('random', recipe_functions.get_random_recipe)
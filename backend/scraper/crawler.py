@@ -0,0 +1,192 @@
+import random
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+from metrics import timed
+
+# Per store host: requests in flight, sustained requests/second and burst size
+CRAWL_HOST_CONCURRENCY = int(config.get('CRAWL_HOST_CONCURRENCY', '2'))
+CRAWL_RATE = float(config.get('CRAWL_RATE', '1'))
+CRAWL_BURST = int(config.get('CRAWL_BURST', '2'))
+CRAWL_MAX_RETRIES = int(config.get('CRAWL_MAX_RETRIES', '3'))
+CRAWL_BACKOFF = float(config.get('CRAWL_BACKOFF', '0.5'))
+CRAWL_TIMEOUT = float(config.get('CRAWL_TIMEOUT', '10'))
+# Pages kept for conditional re-fetches (ETag / Last-Modified)
+CRAWL_CACHE_SIZE = int(config.get('CRAWL_CACHE_SIZE', '256'))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+try:
+    import brotli  # noqa: F401 -- urllib3 decodes br responses when it's installed
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; GroceryScraper/1.0)",
+    "Accept-Encoding": ACCEPT_ENCODING,
+}
+
+
+class TokenBucket:
+    """ Allows `rate` acquisitions per second on average, with bursts of up to `burst`. """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class _Host:
+    def __init__(self, concurrency, rate, burst):
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.bucket = TokenBucket(rate, burst)
+
+
+def _retry_after(response):
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CrawlScheduler:
+    """
+    Fetches pages politely: one keep-alive pool per host, at most
+    `concurrency` requests in flight and `rate` requests/second per host,
+    retries with jittered exponential backoff on 429/5xx and connection
+    errors, and revalidates pages it has seen before with If-None-Match /
+    If-Modified-Since so unchanged pages come back as a cheap 304.
+    """
+
+    def __init__(self, concurrency=CRAWL_HOST_CONCURRENCY, rate=CRAWL_RATE, burst=CRAWL_BURST,
+                 max_retries=CRAWL_MAX_RETRIES, backoff=CRAWL_BACKOFF, timeout=CRAWL_TIMEOUT,
+                 cache_size=CRAWL_CACHE_SIZE):
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self._hosts = {}
+        self._pages = OrderedDict()  # url -> (etag, last_modified, text)
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'not_modified': 0, 'retries': 0, 'failures': 0}
+
+    def _host(self, hostname):
+        with self._lock:
+            host = self._hosts.get(hostname)
+            if host is None:
+                host = self._hosts[hostname] = _Host(self.concurrency, self.rate, self.burst)
+            return host
+
+    def _cached(self, url):
+        with self._lock:
+            page = self._pages.get(url)
+            if page is not None:
+                self._pages.move_to_end(url)
+            return page
+
+    def _remember(self, url, response):
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not (etag or last_modified) or not self.cache_size:
+            return
+        with self._lock:
+            self._pages[url] = (etag, last_modified, response.text)
+            self._pages.move_to_end(url)
+            while len(self._pages) > self.cache_size:
+                self._pages.popitem(last=False)
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _sleep_before_retry(self, attempt, response=None):
+        self._count('retries')
+        # Full jitter, so a burst of failures doesn't retry in lockstep
+        delay = random.uniform(0, self.backoff * (2 ** attempt))
+        server_delay = _retry_after(response) if response is not None else None
+        time.sleep(max(delay, server_delay or 0))
+
+    def fetch(self, url):
+        """ Returns the page text, raising requests' exceptions once retries run out. """
+        hostname = urlparse(url).hostname
+        host = self._host(hostname)
+        cached = self._cached(url)
+        headers = {}
+        if cached is not None:
+            etag, last_modified, _ = cached
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        attempt = 0
+        while True:
+            host.bucket.acquire()
+            try:
+                with host.slots, timed('scraper', hostname):
+                    self._count('requests')
+                    response = host.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt >= self.max_retries:
+                    self._count('failures')
+                    raise
+                self._sleep_before_retry(attempt)
+                attempt += 1
+                continue
+
+            if response.status_code == 304 and cached is not None:
+                self._count('not_modified')
+                return cached[2]
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                self._sleep_before_retry(attempt, response)
+                attempt += 1
+                continue
+            if response.status_code >= 400:
+                self._count('failures')
+            response.raise_for_status()
+            self._remember(url, response)
+            return response.text
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, hosts=len(self._hosts), cached_pages=len(self._pages))
+
+
+scheduler = CrawlScheduler()
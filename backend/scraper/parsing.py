@@ -0,0 +1,125 @@
+import importlib.util
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+import config
+
+# selectolax and lxml are optional; without them we fall back to html.parser.
+# Each backend is imported on first use so importing the scrapers stays cheap.
+HAS_SELECTOLAX = importlib.util.find_spec('selectolax') is not None
+HAS_LXML = importlib.util.find_spec('lxml') is not None and importlib.util.find_spec('cssselect') is not None
+
+# 'auto' picks the fastest installed backend: selectolax, then lxml, then html.parser.
+SCRAPER_PARSER = config.get('SCRAPER_PARSER', 'auto')
+
+
+@dataclass(frozen=True)
+class ScrapeSpec:
+    """
+    Where a store's search page keeps its products.
+
+    `title` and `price` are relative to each `item` card, so a card missing
+    its price is dropped rather than shifting prices onto its neighbours.
+    `strainer` is the (tag, attrs) SoupStrainer arguments matching the cards,
+    so html.parser only builds the part of the tree we read. selectolax and lxml parse the whole page, but fast enough
+    that it doesn't matter.
+    """
+    item: str
+    title: str
+    price: str
+    strainer: Optional[tuple] = None
+
+
+def has_class(name):
+    """
+    Strainer attr matching one class of a multi-class element; html.parser
+    hasn't split the class attribute yet when the strainer runs.
+    """
+    return re.compile(rf'(^|\s){re.escape(name)}(\s|$)')
+
+
+def _lxml_text(node):
+    # Same joining rule as BeautifulSoup's get_text(strip=True)
+    return ''.join(s.strip() for s in node.itertext()) or None
+
+
+def _from_cards(cards, first_text, spec, limit):
+    results = []
+    for card in cards:
+        title = first_text(card, spec.title)
+        price = first_text(card, spec.price)
+        if title and price:
+            results.append({"name": title, "price": price})
+            if len(results) >= limit:
+                break
+    return results
+
+
+def _selectolax_parser():
+    try:
+        from selectolax.lexbor import LexborHTMLParser
+        return LexborHTMLParser
+    except ImportError:
+        # selectolax < 1.0 only ships the Modest backend
+        from selectolax.parser import HTMLParser
+        return HTMLParser
+
+
+def _parse_selectolax(html, spec, limit):
+    tree = _selectolax_parser()(html)
+
+    def first_text(node, selector):
+        match = node.css_first(selector)
+        return (match.text(strip=True) or None) if match is not None else None
+
+    return _from_cards(tree.css(spec.item), first_text, spec, limit)
+
+
+def _parse_lxml(html, spec, limit):
+    import lxml.html
+    tree = lxml.html.fromstring(html)
+
+    def first_text(node, selector):
+        matches = node.cssselect(selector)
+        return _lxml_text(matches[0]) if matches else None
+
+    return _from_cards(tree.cssselect(spec.item), first_text, spec, limit)
+
+
+def _parse_html_parser(html, spec, limit):
+    from bs4 import BeautifulSoup, SoupStrainer
+    parse_only = SoupStrainer(*spec.strainer) if spec.strainer else None
+    soup = BeautifulSoup(html, "html.parser", parse_only=parse_only)
+
+    def first_text(node, selector):
+        match = node.select_one(selector)
+        return (match.get_text(strip=True) or None) if match is not None else None
+
+    return _from_cards(soup.select(spec.item), first_text, spec, limit)
+
+
+PARSERS = {'html.parser': _parse_html_parser}
+if HAS_SELECTOLAX:
+    PARSERS['selectolax'] = _parse_selectolax
+if HAS_LXML:
+    PARSERS['lxml'] = _parse_lxml
+
+
+def default_parser():
+    if SCRAPER_PARSER != 'auto':
+        return SCRAPER_PARSER
+    for name in ('selectolax', 'lxml', 'html.parser'):
+        if name in PARSERS:
+            return name
+
+
+def extract_products(html, spec: ScrapeSpec, limit=5, parser=None):
+    """
+    Returns up to `limit` {"name", "price"} dicts. Cards past the limit are
+    never read. `parser` overrides SCRAPER_PARSER for one call.
+    """
+    parser = parser or default_parser()
+    if parser not in PARSERS:
+        raise ValueError(f"Parser '{parser}' is not installed; available: {sorted(PARSERS)}")
+    return PARSERS[parser](html, spec, limit)
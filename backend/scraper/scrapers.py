@@ -1,114 +1,200 @@
-from .utils import fetch_html
+from .parsing import ScrapeSpec, has_class
+from .crawler import scheduler
+from .utils import fetch_products
 import requests
-from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
-import os
 
-load_dotenv()
+import config
+from metrics import in_request_context, timed
+
 API_BASE = "https://openpricengine.com/api/v1/stores/products/names/plan"
-API_KEY = os.getenv('OPEN_PRICE_API_KEY')
+API_KEY = config.get('OPEN_PRICE_API_KEY')
 USA_STORES = ['traderjoes']
 
-
-def get_food_prices(product_name, currency="Default"):
-    url = 'https://openpricengine.com/api/v1/multiple_stores/prices/query'
-    headers = {
-        'accept': 'application/json',
-        'Authorization': API_KEY
+PRICE_QUERY_URL = 'https://openpricengine.com/api/v1/multiple_stores/prices/query'
+# Per-store deadline (seconds), counted from when the lookup starts. A store
+# that doesn't answer in time is reported as an empty result instead of
+# holding up the whole request.
+STORE_TIMEOUT = float(config.get('PRICE_STORE_TIMEOUT', '8'))
+# Keep-alive connections kept open to the price API.
+MAX_STORE_WORKERS = int(config.get('PRICE_MAX_WORKERS', '8'))
+# Threads for batch scraping; the crawl scheduler still caps each store host
+MAX_SCRAPE_WORKERS = int(config.get('SCRAPE_MAX_WORKERS', '8'))
+
+# One keep-alive session shared by every store lookup, so repeated searches
+# reuse the TLS connection to openpricengine instead of reconnecting.
+_session = requests.Session()
+_session.headers.update({'accept': 'application/json'})
+_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=MAX_STORE_WORKERS))
+
+# Where each store's search page keeps its product cards
+WALMART_SPEC = ScrapeSpec(
+    item="div.mb1",
+    title="a.w_iUH7",
+    price="span.price-group",
+    strainer=("div", {"class": has_class("mb1")}),
+)
+TARGET_SPEC = ScrapeSpec(
+    item="div[data-test='@web/site-top-of-funnel/ProductCardWrapper']",
+    title="div[data-test='product-title']",
+    price="span[data-test='current-price']",
+    strainer=("div", {"data-test": "@web/site-top-of-funnel/ProductCardWrapper"}),
+)
+KROGER_SPEC = ScrapeSpec(
+    item="div.AutoGrid-cell",
+    title="h3.ProductName",
+    price="data[data-qa='ProductPrice']",
+    strainer=("div", {"class": has_class("AutoGrid-cell")}),
+)
+
+
+class PriceResults(dict):
+    """
+    {store: [products]} from get_food_prices. `failed` holds the stores whose
+    [] stands in for an error or a timeout rather than an empty answer, so
+    callers know not to cache it.
+    """
+
+    def __init__(self, results=(), failed=()):
+        super().__init__(results)
+        self.failed = frozenset(failed)
+
+
+def _fetch_store_prices(store, product_name, currency, start_date, end_date, timeout):
+    params = {
+        'stores': [store],
+        'productname': product_name,
+        'start_date': start_date,
+        'end_date': end_date,
+        'currency': currency
     }
-    
-    results = {}
 
-    for store in USA_STORES:
-        params = {
-            'stores': [store],
-            'productname': product_name,
-            'start_date': '2025-11-05',
-            'end_date': '2025-11-06',
-            'currency': currency
+    try:
+        with timed('price_api', store):
+            response = _session.get(
+                PRICE_QUERY_URL,
+                headers={'Authorization': API_KEY},
+                params=params,
+                timeout=timeout
+            )
+
+            response.raise_for_status()
+
+        data = response.json()
+        return data if data else []
+
+    # None rather than [], so get_food_prices can report the store as failed
+    except requests.exceptions.JSONDecodeError as e:
+        print(f"JSON Decode Error for {store}: {e}")
+        return None
+    except requests.exceptions.RequestException as e:
+        print(f"API Error for {store}: {e}")
+        return None
+
+
+def get_food_prices(product_name, currency="Default", stores=None, timeout=STORE_TIMEOUT,
+                    start_date=None, end_date=None):
+    """
+    Queries every store concurrently and returns a PriceResults of
+    {store: [products]}. Stores that error or miss the deadline come back as
+    [] and are listed in `.failed`, so the caller still gets partial results.
+    Dates are 'YYYY-MM-DD' and default to the last day.
+
+    Each call gets its own threads, one per store, so a lookup never queues
+    behind other requests' and its deadline starts when its calls do.
+    """
+    stores = stores or USA_STORES
+    end_date = end_date or datetime.now().strftime('%Y-%m-%d')
+    start_date = start_date or (datetime.strptime(end_date, '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d')
+
+    executor = ThreadPoolExecutor(max_workers=len(stores), thread_name_prefix='prices')
+    try:
+        fetch = in_request_context(_fetch_store_prices)
+        futures = {
+            executor.submit(fetch, store, product_name, currency, start_date, end_date, timeout): store
+            for store in stores
         }
+        with timed('price_api', 'fan_out'):
+            wait(futures, timeout=timeout)
+    finally:
+        # Don't wait for stragglers; the session timeout bounds them
+        executor.shutdown(wait=False)
 
-        try:
-            response = requests.get(url, headers=headers, params=params)
-            
-            response.raise_for_status() 
-            
-            data = response.json()
-
-            if data:
-                results[store] = data
-            else:
-                results[store] = [] 
-
-        except requests.exceptions.RequestException as e:
-            print(f"API Error for {store}: {e}")
-            results[store] = []
-        except requests.exceptions.JSONDecodeError as e:
-            print(f"JSON Decode Error for {store}: {e}")
+    results = {}
+    failed = set()
+    for future, store in futures.items():
+        if future.done():
+            results[store] = future.result()
+        else:
+            print(f"Timed out waiting for {store} after {timeout}s")
+            results[store] = None
+        if results[store] is None:
+            failed.add(store)
             results[store] = []
 
-    return results
+    return PriceResults(results, failed)
 
 
 def get_walmart_prices(item: str):
     query = item.replace(" ", "+")
     url = f"https://www.walmart.com/search?q={query}"
-
-    soup = fetch_html(url)
-    results = []
-
-    for product in soup.select("div.mb1"):
-        title = product.select_one("a.w_iUH7").get_text(strip=True) if product.select_one("a.w_iUH7") else None
-        price = product.select_one("span.price-group")
-        price_text = price.get_text(strip=True) if price else None
-
-        if title and price_text:
-            results.append({"name": title, "price": price_text})
-
-        if len(results) >= 5:
-            break
-
-    return results
+    return fetch_products(url, WALMART_SPEC)
 
 
 def get_target_prices(item: str):
     query = item.replace(" ", "+")
     url = f"https://www.target.com/s?searchTerm={query}"
-
-    soup = fetch_html(url)
-    results = []
-
-    for product in soup.select("div[data-test='product-title']"):
-        title = product.get_text(strip=True)
-        price_el = soup.select_one("span[data-test='current-price']")
-        price_text = price_el.get_text(strip=True) if price_el else None
-
-        if title and price_text:
-            results.append({"name": title, "price": price_text})
-
-        if len(results) >= 5:
-            break
-
-    return results
+    return fetch_products(url, TARGET_SPEC)
 
 
 def get_kroger_prices(item: str):
     query = item.replace(" ", "-")
     url = f"https://www.kroger.com/search?query={query}"
-    soup = fetch_html(url)
-    results = []
-
-    for product in soup.select("div.AutoGrid-cell"):
-        title = product.select_one("h3.ProductName").get_text(strip=True) if product.select_one("h3.ProductName") else None
-        price_el = product.select_one("data[data-qa='ProductPrice']")
-        price = price_el.get_text(strip=True) if price_el else None
-
-        if title and price:
-            results.append({"name": title, "price": price})
-
-        if len(results) >= 5:
-            break
-
+    return fetch_products(url, KROGER_SPEC)
+
+
+STORE_SCRAPERS = {
+    'walmart': get_walmart_prices,
+    'target': get_target_prices,
+    'kroger': get_kroger_prices,
+}
+
+_scrape_executor = ThreadPoolExecutor(max_workers=MAX_SCRAPE_WORKERS, thread_name_prefix='scrape')
+
+
+def _scrape(store, item):
+    try:
+        return STORE_SCRAPERS[store](item)
+    except Exception as e:
+        print(f"Scrape Error for {store} '{item}': {e}")
+        return []
+
+
+def scrape_items(items, stores=None):
+    """
+    Scrapes every item at every store in parallel and returns
+    {item: {store: [products]}}. Stores that fail come back as [].
+    Per-host politeness is left to the crawl scheduler, so hosts with a
+    backlog just queue while the other stores keep going.
+    """
+    stores = stores or list(STORE_SCRAPERS)
+    unknown = [s for s in stores if s not in STORE_SCRAPERS]
+    if unknown:
+        raise ValueError(f"Unknown stores: {unknown}")
+
+    scrape = in_request_context(_scrape)
+    futures = {
+        (item, store): _scrape_executor.submit(scrape, store, item)
+        for item in dict.fromkeys(items)
+        for store in stores
+    }
+    results = {}
+    for (item, store), future in futures.items():
+        results.setdefault(item, {})[store] = future.result()
     return results
 
 
+def scrape_stats():
+    return scheduler.stats()
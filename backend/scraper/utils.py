@@ -1,10 +1,15 @@
-import requests
-from bs4 import BeautifulSoup
-
-def fetch_html(url: str) -> BeautifulSoup:
-    headers = {
-        "User-Agent": "Mozilla/5.0 (compatible; GroceryScraper/1.0)"
-    }
-    response = requests.get(url, headers=headers, timeout=10)
-    response.raise_for_status()
-    return BeautifulSoup(response.text, "html.parser")
\ No newline at end of file
+from metrics import timed
+from .crawler import scheduler
+from .parsing import ScrapeSpec, extract_products
+
+
+def fetch_page(url: str) -> str:
+    """ Goes through the crawl scheduler: per-host rate limits, retries and revalidation. """
+    return scheduler.fetch(url)
+
+
+def fetch_products(url: str, spec: ScrapeSpec, limit=5, parser=None):
+    """ Fetches a search page and pulls the first `limit` products out of it. """
+    html = fetch_page(url)
+    with timed('scraper', 'parse'):
+        return extract_products(html, spec, limit=limit, parser=parser)
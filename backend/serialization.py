@@ -0,0 +1,164 @@
+import gzip
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+import config
+
+# orjson and brotli are optional; without them we fall back to the stdlib
+# encoder and gzip.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this go out uncompressed; the headers would eat the gain.
+COMPRESS_MIN_BYTES = int(config.get('COMPRESS_MIN_BYTES', '1024'))
+COMPRESS_LEVEL = int(config.get('COMPRESS_LEVEL', '6'))
+# Brotli quality 4 compresses about as fast as gzip -6 and smaller.
+BROTLI_QUALITY = int(config.get('BROTLI_QUALITY', '4'))
+COMPRESSIBLE_TYPES = ('application/json', 'text/plain', 'text/html')
+
+
+def document_dict(doc):
+    """ A DocumentSnapshot as the dict routes return: its fields plus 'id'. """
+    data = doc.to_dict() or {}
+    data['id'] = doc.id
+    return data
+
+
+def default(obj):
+    """
+    Encodes what Firestore hands back. Timestamps come back as
+    DatetimeWithNanoseconds, a datetime subclass orjson won't take natively.
+    """
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    # Duck-typed so the Firestore SDK doesn't have to be imported to encode
+    if hasattr(obj, 'to_dict') and hasattr(obj, 'reference'):
+        return document_dict(obj)
+    if hasattr(obj, 'path') and hasattr(obj, 'parent') and hasattr(obj, 'id'):
+        return obj.path
+    if hasattr(obj, 'latitude') and hasattr(obj, 'longitude'):
+        return {'latitude': obj.latitude, 'longitude': obj.longitude}
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    # Sorted keys, like jsonify, so every worker produces the same bytes and ETag
+    _ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj):
+        return orjson.dumps(obj, default=default, option=_ORJSON_OPTIONS)
+else:
+    def dumps_bytes(obj):
+        return json.dumps(obj, default=default, sort_keys=True, separators=(',', ':')).encode()
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """ Flask JSON provider: orjson when installed, Firestore types either way. """
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s) if orjson is not None else json.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
+
+
+def stream_json_array(items, transform=None):
+    """
+    Yields a JSON array one element at a time, so a large collection is
+    written as Firestore streams it instead of being built up in memory.
+    """
+    yield b'['
+    first = True
+    for item in items:
+        if not first:
+            yield b','
+        first = False
+        yield dumps_bytes(transform(item) if transform else item)
+    yield b']\n'
+
+
+def _negotiate(accept_encoding):
+    """
+    The coding to use for an Accept-Encoding header: the highest q-value
+    among br (when installed) and gzip, brotli on a tie. q=0 means "not
+    acceptable" (RFC 9110), also when it comes through the '*' wildcard.
+    """
+    qvalues = {}
+    for part in accept_encoding.split(','):
+        coding, *params = [p.strip() for p in part.split(';')]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qvalues[coding.lower()] = q
+
+    wildcard = qvalues.get('*', 0.0)
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best, best_q = None, 0.0
+    for coding in offered:
+        q = qvalues.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def init_app(app):
+    """ Installs the JSON provider and compresses buffered responses the client accepts. """
+    from flask import request
+
+    app.json_provider_class = FastJSONProvider
+    app.json = FastJSONProvider(app)
+
+    @app.after_request
+    def _compress(response):
+        if (response.is_streamed or response.direct_passthrough
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+
+        encoding = _negotiate(request.headers.get('Accept-Encoding', ''))
+        response.vary.add('Accept-Encoding')
+        if encoding is None:
+            return response
+
+        body = response.get_data()
+        if len(body) < COMPRESS_MIN_BYTES:
+            return response
+        if encoding == 'br':
+            body = brotli.compress(body, quality=BROTLI_QUALITY)
+        else:
+            body = gzip.compress(body, compresslevel=COMPRESS_LEVEL, mtime=0)
+
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        # The encoded bytes differ from what the ETag hashed, so it can only
+        # be a weak validator now; If-None-Match still matches it weakly.
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
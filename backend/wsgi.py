@@ -0,0 +1,2 @@
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+from app import app
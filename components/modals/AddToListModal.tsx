@@ -69,17 +69,14 @@ export const AddToListModal = () => {
       purchased: false,
     }));
 
-    const promise = Promise.all(
-      itemsToAdd.map(item =>
-        fetch(`${API_URL}/api/lists/${selectedListId}/items`, {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify(item),
-        }).then(res => {
-          if (!res.ok) throw new Error('One or more items failed to add.');
-        })
-      )
-    );
+    // All ingredients go in as a single batched write
+    const promise = fetch(`${API_URL}/api/lists/${selectedListId}/items:batch`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ items: itemsToAdd }),
+    }).then(res => {
+      if (!res.ok) throw new Error('Failed to add items to the list.');
+    });
 
     toast.promise(
       promise,